@@ -1,18 +1,7 @@
-from core.settings import settings
+from fastapi import Request
+
 from lib.typesense.client import AsyncClient
 
 
-async def typesense_client() -> AsyncClient:
-    return AsyncClient(
-        {
-            "api_key": settings.typesense_api_key,
-            "nodes": [
-                {
-                    "host": settings.typesense_host,
-                    "port": settings.typesense_port,
-                    "protocol": settings.typesense_protocol,
-                }
-            ],
-            "connection_timeout_seconds": 10,
-        }
-    )
+async def typesense_client(request: Request) -> AsyncClient:
+    return request.app.state.typesense_client
@@ -1,15 +1,13 @@
-from fastapi import Depends
+from fastapi import Depends, Request
 from services.search import TextSearch
 from services.upload import FileUploader
 from lib.typesense.client import AsyncClient
 from api.dependencies.clients import typesense_client
-from api.v1.models.tasks import InvestigateTaskCreateRequest
+from api.v1.models.tasks import InvestigateTaskCreateRequest, TaskRequeueRequest
 
 
-async def search_service(
-    typesense_client_obj: AsyncClient = Depends(typesense_client),
-) -> TextSearch:
-    return TextSearch(client=typesense_client_obj, project_name="")
+async def search_service(request: Request) -> TextSearch:
+    return request.app.state.search_service
 
 
 async def upload_service(
@@ -17,3 +15,12 @@ async def upload_service(
     typesense_client_obj: AsyncClient = Depends(typesense_client),
 ) -> FileUploader:
     return FileUploader(client=typesense_client_obj, project_name=data.project_name)
+
+
+async def requeue_service(
+    data: TaskRequeueRequest,
+    typesense_client_obj: AsyncClient = Depends(typesense_client),
+) -> FileUploader:
+    return FileUploader(
+        client=typesense_client_obj, project_name=data.project_name or ""
+    )
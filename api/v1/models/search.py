@@ -1,12 +1,40 @@
-from typing import List
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel, Field
-from db.typesense.models import BookPageModel
 
 
 class BookPageSearchRequest(BaseModel):
     query: str
     project_name: str = "kgb_project"
+    page: int = Field(1, ge=1)
+    per_page: int = Field(10, ge=1, le=250)
+    include_content: bool = True
+    book_name: Optional[str] = None
+    file_path: Optional[str] = None
 
 
-class BookPageResponse(BookPageModel):
+class BookPageMultiSearchRequest(BaseModel):
+    query: str
+    projects: Union[List[str], Literal["all"]] = "all"
+    limit: int = Field(20, ge=1, le=250)
+    include_content: bool = True
+    book_name: Optional[str] = None
+    file_path: Optional[str] = None
+
+
+class BookPageResponse(BaseModel):
+    file_path: str
+    book_name: str
+    page_number: int
+    page_content: Optional[str] = None
     snippets: List[str] = Field(default_factory=list)
+
+
+class ProjectBookPageResponse(BookPageResponse):
+    project_name: str
+
+
+class SearchCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
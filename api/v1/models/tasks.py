@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from db.typesense.models import UploadTaskStatus, UploadTaskType
 
 
 class InvestigateTaskCreateRequest(BaseModel):
@@ -6,3 +10,16 @@ class InvestigateTaskCreateRequest(BaseModel):
     file_path: str
     project_name: str
     provider: str
+
+
+class TaskRequeueRequest(BaseModel):
+    project_name: Optional[str] = None
+    task_type: Optional[UploadTaskType] = None
+    statuses: List[Literal[UploadTaskStatus.failed, UploadTaskStatus.dead]] = Field(
+        default_factory=lambda: [UploadTaskStatus.failed, UploadTaskStatus.dead],
+        min_length=1,
+    )
+
+
+class TaskRequeueResponse(BaseModel):
+    requeued: int
@@ -1,8 +1,15 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 
-from api.v1.models.search import BookPageSearchRequest, BookPageResponse
+from api.v1.models.search import (
+    BookPageSearchRequest,
+    BookPageMultiSearchRequest,
+    BookPageResponse,
+    ProjectBookPageResponse,
+    SearchCacheStatsResponse,
+)
 from api.dependencies.auth import authenticated_user
 from api.dependencies.services import search_service
 from services.search import TextSearch
@@ -11,12 +18,55 @@ from db.models import User
 router = APIRouter(prefix="/search", tags=["search"])
 
 
-@router.post(r"", responses={200: {"model": List[BookPageResponse]}})
+@router.post(
+    r"", response_model=None, responses={200: {"model": List[BookPageResponse]}}
+)
 async def search_text_handler(
     request: Request,
     data: BookPageSearchRequest,
     search_service_obj: TextSearch = Depends(search_service),
     user: User = Depends(authenticated_user),
-) -> List[BookPageResponse]:
-    search_service_obj.project_name = data.project_name
-    return await search_service_obj.search(data.query)
+) -> JSONResponse:
+    # hits are built in the response shape already, skip re-validating them
+    hits = await search_service_obj.search(
+        data.query,
+        data.project_name,
+        page=data.page,
+        per_page=data.per_page,
+        include_content=data.include_content,
+        filters={"book_name": data.book_name, "file_path": data.file_path},
+    )
+    return JSONResponse(hits)
+
+
+@router.post(
+    r"/multi",
+    response_model=None,
+    responses={200: {"model": List[ProjectBookPageResponse]}},
+)
+async def multi_search_text_handler(
+    request: Request,
+    data: BookPageMultiSearchRequest,
+    search_service_obj: TextSearch = Depends(search_service),
+    user: User = Depends(authenticated_user),
+) -> JSONResponse:
+    try:
+        hits = await search_service_obj.multi_search(
+            data.query,
+            data.projects,
+            limit=data.limit,
+            include_content=data.include_content,
+            filters={"book_name": data.book_name, "file_path": data.file_path},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return JSONResponse(hits)
+
+
+@router.get(r"/cache", responses={200: {"model": SearchCacheStatsResponse}})
+async def search_cache_stats_handler(
+    request: Request,
+    search_service_obj: TextSearch = Depends(search_service),
+    user: User = Depends(authenticated_user),
+) -> SearchCacheStatsResponse:
+    return SearchCacheStatsResponse(**search_service_obj.cache.stats())
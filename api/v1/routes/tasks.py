@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, Request
 
-from api.v1.models.tasks import InvestigateTaskCreateRequest
+from api.v1.models.tasks import (
+    InvestigateTaskCreateRequest,
+    TaskRequeueRequest,
+    TaskRequeueResponse,
+)
 from api.dependencies.auth import authenticated_user
-from api.dependencies.services import upload_service
+from api.dependencies.services import requeue_service, upload_service
 from services.upload import FileUploader
 from db.models import User
+from db.typesense.models import UploadTaskPriority
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
@@ -16,5 +21,20 @@ async def create_task_handler(
     upload_service_obj: FileUploader = Depends(upload_service),
     user: User = Depends(authenticated_user),
 ) -> dict:
-    await upload_service_obj.search(data.file_path, data.lang, data.provider)
+    await upload_service_obj.create_investigate_task(
+        data.file_path,
+        data.lang,
+        data.provider,
+        priority=UploadTaskPriority.interactive.value,
+    )
     return dict()
+
+
+@router.post(r"/requeue", responses={200: {"model": TaskRequeueResponse}})
+async def requeue_tasks_handler(
+    data: TaskRequeueRequest,
+    upload_service_obj: FileUploader = Depends(requeue_service),
+    user: User = Depends(authenticated_user),
+) -> TaskRequeueResponse:
+    requeued = await upload_service_obj.requeue_tasks(data.statuses, data.task_type)
+    return TaskRequeueResponse(requeued=requeued)
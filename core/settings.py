@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import List
 from pydantic_settings import BaseSettings
 
 
@@ -7,13 +8,71 @@ class TypesenseSettings(BaseSettings):
     typesense_port: int = 8108
     typesense_protocol: str = "http"
     typesense_api_key: str
+    typesense_connection_pool_size: int = 100
+    typesense_healthcheck_on_startup: bool = False
+    typesense_import_batch_size: int = 250
+    typesense_import_concurrency: int = 4
+    typesense_import_retries: int = 3
 
 
 class GoogleSettings(BaseSettings):
     google_service_account_file: str
+    google_crawler_workers: int = 8
 
 
-class Settings(TypesenseSettings, GoogleSettings):
+class DownloadSettings(BaseSettings):
+    download_chunk_size: int = 32 * 1024 * 1024
+    download_spool_max_size: int = 32 * 1024 * 1024
+
+
+class PdfSettings(BaseSettings):
+    pdf_text_workers: int = 0
+    pdf_text_pages_per_job: int = 50
+    pdf_text_threshold: int = 100
+
+
+class OcrSettings(BaseSettings):
+    ocr_workers: int = 0
+    ocr_page_timeout: int = 300
+    ocr_profile: str = "balanced"
+    ocr_adaptive: bool = False
+    ocr_adaptive_min_confidence: float = 70.0
+    ocr_render_threads: int = 1
+    ocr_render_batch_size: int = 4
+    ocr_cache_path: str = "/var/cache/docs_parser/ocr.sqlite3"
+    ocr_cache_max_size: int = 1024 * 1024 * 1024
+
+
+class SearchCacheSettings(BaseSettings):
+    search_cache_size: int = 1024
+    search_cache_ttl: int = 300
+    search_cache_revalidate_seconds: int = 5
+
+
+class TaskSettings(BaseSettings):
+    task_lease_seconds: int = 300
+    task_heartbeat_seconds: int = 60
+    task_project_concurrency: int = 0
+    task_max_attempts: int = 5
+    task_retry_base_seconds: int = 30
+    task_retry_max_seconds: int = 3600
+    task_poll_min_seconds: int = 1
+    task_poll_max_seconds: int = 60
+    task_notify_host: str = "0.0.0.0"
+    task_notify_port: int = 0
+    task_notify_urls: List[str] = []
+    task_notify_timeout: float = 1.0
+
+
+class Settings(
+    TypesenseSettings,
+    GoogleSettings,
+    DownloadSettings,
+    PdfSettings,
+    OcrSettings,
+    SearchCacheSettings,
+    TaskSettings,
+):
     api_token: str = "dev_token"
 
 
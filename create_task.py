@@ -10,25 +10,15 @@ from services.upload import FileUploader
 
 
 async def main():
-    client = AsyncClient(
-        {
-            "api_key": settings.typesense_api_key,
-            "nodes": [
-                {
-                    "host": settings.typesense_host,
-                    "port": settings.typesense_port,
-                    "protocol": settings.typesense_protocol,
-                }
-            ],
-            "connection_timeout_seconds": 10,
-        }
-    )
+    client = AsyncClient.from_settings(settings)
     service = FileUploader(client, "kgb_project")
     await service.create_investigate_task(sys.argv[1], sys.argv[2], "google")
     try:
         await client.create_collection("kgb_project", BookPageModel)
     except ObjectAlreadyExists:
         pass
+    finally:
+        await client.close()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
-from enum import Enum
+import hashlib
+from enum import Enum, IntEnum
 from pydantic import BaseModel
 
 
@@ -7,6 +8,9 @@ class UploadTaskStatus(str, Enum):
     pending = "pending"
     success = "success"
     failed = "failed"
+    dead = "dead"
+    # an older success task of a file that has been indexed again
+    superseded = "superseded"
 
 
 class UploadTaskType(str, Enum):
@@ -14,16 +18,39 @@ class UploadTaskType(str, Enum):
     upload = "upload"
 
 
+class UploadTaskPriority(IntEnum):
+    bulk = 1
+    interactive = 10
+
+
+class ConverterCost(str, Enum):
+    cheap = "cheap"
+    expensive = "expensive"
+
+
 class BookPageModel(BaseModel):
     file_path: str
     book_name: str
     page_number: int
     page_content: str
+    # provider id of the source file, file_path is only its display path
+    source_id: str = ""
 
     class Config:
         default_sorting_field = "page_number"
 
 
+class ProjectGenerationModel(BaseModel):
+    generation: int
+
+    class Config:
+        default_sorting_field = "generation"
+
+
+def page_document_id(source_id: str, page_number: int) -> str:
+    return hashlib.sha1(f"{source_id}:{page_number}".encode()).hexdigest()
+
+
 class UploadTaskModel(BaseModel):
     lang: str
     file_path: str
@@ -32,8 +59,22 @@ class UploadTaskModel(BaseModel):
     provider: str
     file_name: str = ""
     task_type: UploadTaskType = UploadTaskType.investigate
-    priority: int = 1
+    priority: int = UploadTaskPriority.bulk.value
+    content_hash: str = ""
+    md5_checksum: str = ""
+    modified_time: str = ""
+    mime_type: str = ""
+    cost: ConverterCost = ConverterCost.expensive
+    worker_id: str = ""
+    lease_expires_at: int = 0
+    version: int = 0
+    checkpoint_page: int = 0
+    checkpoint_batch: int = 0
+    attempts: int = 0
+    not_before: int = 0
+    last_error: str = ""
 
     class Config:
         use_enum_values = True
         default_sorting_field = "priority"
+        facet_fields = ("project_name",)
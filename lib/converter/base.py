@@ -1,16 +1,33 @@
+import asyncio
 import os
 import aiohttp
-import aiofiles
 import io
+import shutil
+import tempfile
 from abc import abstractmethod
-from typing import IO, List
+from contextlib import asynccontextmanager
+from typing import IO, AsyncIterator, Iterator, Optional
 
-from db.typesense.models import BookPageModel
+from core.settings import settings
+from db.typesense.models import BookPageModel, ConverterCost, page_document_id
+from lib.typesense.bulk import BulkWriter, CommitCallback
 from lib.typesense.client import AsyncClient
 
 
+def download_buffer(size: Optional[int] = None) -> IO[bytes]:
+    """
+    Downloads known to be larger than the spool limit go straight to a named
+    temporary file, so ``materialize`` can hand it to worker processes
+    without copying it again.
+    """
+    if size and size > settings.download_spool_max_size:
+        return tempfile.NamedTemporaryFile()
+    return tempfile.SpooledTemporaryFile(max_size=settings.download_spool_max_size)
+
+
 class BaseConverter:
     _chunk_size = 50
+    cost = ConverterCost.cheap
 
     def __init__(
         self, client: AsyncClient, project_name: str, file_path: str, *args, **kwargs
@@ -19,7 +36,10 @@ class BaseConverter:
         self.client = client
         self.file_path = file_path
         self.reader = kwargs.get("reader")
-        self.content: bytes = kwargs.get("content", b"")
+        self.content: bytes | IO[bytes] = kwargs.get("content", b"")
+        self._materialized_path: str = ""
+        self.start_page: int = max(kwargs.get("start_page", 1), 1)
+        self.source_id: str = kwargs.get("source_id") or file_path
 
     @classmethod
     async def create(
@@ -30,12 +50,17 @@ class BaseConverter:
             await instance.load_content()
         return instance
 
-    async def download_file(self, url: str):
+    async def download_file(self, url: str) -> IO[bytes]:
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as response:
                 response.raise_for_status()
-                content = await response.read()
-                return io.BytesIO(content)
+                spool = download_buffer(response.content_length)
+                async for chunk in response.content.iter_chunked(
+                    settings.download_chunk_size
+                ):
+                    spool.write(chunk)
+        spool.seek(0)
+        return spool
 
     async def load_content(self):
         if not self.content:
@@ -43,26 +68,125 @@ class BaseConverter:
                 content = await self.download_file(self.file_path)
                 self.file_name = os.path.basename(self.file_path)
             else:
-                async with aiofiles.open(self.file_path, mode="rb") as file:
-                    content = await file.read()
+                content = open(self.file_path, mode="rb")
                 self.file_name = os.path.basename(self.file_path)
 
             self.content = content
 
+    def content_stream(self) -> IO[bytes]:
+        if isinstance(self.content, (bytes, bytearray)):
+            return io.BytesIO(self.content)
+        self.content.seek(0)
+        return self.content
+
+    @asynccontextmanager
+    async def materialize(self) -> AsyncIterator[str]:
+        """
+        Provide the content as a file on disk, so it can be opened by worker
+        processes. Local files and large downloads are used as is, other
+        content is copied once to a temporary file.
+        """
+        name = getattr(self.content, "name", None)
+        if isinstance(name, str) and os.path.isfile(name):
+            yield name
+            return
+        if self._materialized_path:
+            yield self._materialized_path
+            return
+        loop = asyncio.get_running_loop()
+        with tempfile.NamedTemporaryFile() as file:
+            await loop.run_in_executor(
+                None, shutil.copyfileobj, self.content_stream(), file
+            )
+            await loop.run_in_executor(None, file.flush)
+            self._materialized_path = file.name
+            try:
+                yield file.name
+            finally:
+                self._materialized_path = ""
+
+    def close(self):
+        if not isinstance(self.content, (bytes, bytearray)):
+            self.content.close()
+
     @abstractmethod
-    async def collect_pages(self) -> List[BookPageModel]:
-        pass
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
+        yield
 
     async def _save_to_typesense(
-        self, pages: List[BookPageModel], *args, **kwargs
+        self,
+        pages: AsyncIterator[BookPageModel],
+        *args,
+        on_commit: Optional[CommitCallback] = None,
+        **kwargs,
     ) -> None:
-        await self.client.collections[self.project_name].documents.aimport_(
-            [page.model_dump(mode="json") for page in pages], {"action": "create"}
-        )
+        async with BulkWriter(
+            self.client.collections[self.project_name].documents,
+            batch_size=self._chunk_size,
+            on_commit=on_commit,
+        ) as writer:
+            async for page in pages:
+                # converters that can't seek still produce the skipped pages
+                if page.page_number < self.start_page:
+                    continue
+                page.source_id = self.source_id
+                await writer.add(
+                    {
+                        "id": page_document_id(self.source_id, page.page_number),
+                        **page.model_dump(mode="json"),
+                    }
+                )
 
     async def save_to_db(self, db_name: str = "typesense", *args, **kwargs) -> None:
         method = getattr(self, f"_save_to_{db_name}", None)
         if not method:
             raise ValueError(f"Unsupported database: {db_name}")
-        pages = await self.collect_pages()
-        return await method(pages, *args, **kwargs)
+        await method(self.collect_pages(), *args, **kwargs)
+
+
+class BlockConverter(BaseConverter):
+    """
+    Base for formats read as a stream of text blocks (paragraphs, tables,
+    lines) that are packed into pages of ``_chars_per_page`` characters.
+    """
+
+    _chars_per_page = 3300
+
+    @abstractmethod
+    def iter_blocks(self) -> Iterator[str]:
+        pass
+
+    def get_book_name(self) -> str:
+        return self.file_path
+
+    def iter_pages(self, blocks: Iterator[str]) -> Iterator[str]:
+        parts = list()
+        char_count = 0
+        for block in blocks:
+            block_text = block + "\n"
+            parts.append(block_text)
+            char_count += len(block_text)
+            if char_count >= self._chars_per_page:
+                yield "".join(parts).strip()
+                parts = list()
+                char_count = 0
+        text = "".join(parts).strip()
+        if text:
+            yield text
+
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
+        book_name = self.get_book_name()
+        loop = asyncio.get_running_loop()
+        pages = self.iter_pages(self.iter_blocks())
+        page_num = 1
+        while True:
+            text = await loop.run_in_executor(None, next, pages, None)
+            if text is None:
+                break
+            yield BookPageModel(
+                file_path=self.file_path,
+                book_name=book_name,
+                page_number=page_num,
+                page_content=text,
+            )
+            page_num += 1
@@ -0,0 +1,50 @@
+import io
+import posixpath
+import zipfile
+from typing import IO, Iterator, Tuple
+from xml.etree import ElementTree
+
+from lib.converter.base import BlockConverter
+from lib.converter.text.reader import iter_html_blocks
+
+CONTAINER = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+OPF = "{http://www.idpf.org/2007/opf}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+
+
+class EpubReader(BlockConverter):
+    _read_size = 64 * 1024
+
+    @staticmethod
+    def _read_package(archive: zipfile.ZipFile) -> Tuple[str, ElementTree.Element]:
+        container = ElementTree.fromstring(archive.read("META-INF/container.xml"))
+        rootfile = container.find(f".//{CONTAINER}rootfile").get("full-path")
+        return rootfile, ElementTree.fromstring(archive.read(rootfile))
+
+    def get_book_name(self) -> str:
+        with zipfile.ZipFile(self.content_stream()) as archive:
+            _, package = self._read_package(archive)
+        title = (package.findtext(f".//{DC}title") or "").strip()
+        return title or self.file_path
+
+    def _iter_chapter(self, chapter: IO[bytes]) -> Iterator[str]:
+        stream = io.TextIOWrapper(chapter, encoding="utf-8", errors="replace")
+        while chunk := stream.read(self._read_size):
+            yield chunk
+
+    def iter_blocks(self) -> Iterator[str]:
+        with zipfile.ZipFile(self.content_stream()) as archive:
+            rootfile, package = self._read_package(archive)
+            base = posixpath.dirname(rootfile)
+            manifest = {
+                item.get("id"): posixpath.normpath(
+                    posixpath.join(base, item.get("href"))
+                )
+                for item in package.iter(f"{OPF}item")
+            }
+            for itemref in package.iter(f"{OPF}itemref"):
+                name = manifest.get(itemref.get("idref"))
+                if not name:
+                    continue
+                with archive.open(name) as chapter:
+                    yield from iter_html_blocks(self._iter_chapter(chapter))
@@ -0,0 +1,47 @@
+import asyncio
+from typing import AsyncIterator
+
+from PIL import Image
+
+from db.typesense.models import BookPageModel, ConverterCost
+from lib.converter.base import BaseConverter
+from lib.ocr.engine import OcrEngine, get_ocr_engine
+from lib.typesense.client import AsyncClient
+
+
+class ImageReader(BaseConverter):
+    """
+    Scanned images (png, jpg, multi-page tiff), one page per frame.
+    """
+
+    cost = ConverterCost.expensive
+
+    def __init__(
+        self, client: AsyncClient, project_name: str, file_path: str, *args, **kwargs
+    ):
+        super().__init__(client, project_name, file_path, *args, **kwargs)
+        self.lang: str = kwargs.get("lang", "eng")
+        self.ocr_engine: OcrEngine = kwargs.get("ocr_engine") or get_ocr_engine()
+
+    def _sync_frame(self, image: Image.Image, index: int) -> Image.Image:
+        image.seek(index)
+        return image.convert("RGB")
+
+    async def _page_jobs(self) -> AsyncIterator:
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(None, Image.open, self.content_stream())
+        with image:
+            for index in range(self.start_page - 1, getattr(image, "n_frames", 1)):
+                frame = await loop.run_in_executor(None, self._sync_frame, image, index)
+                yield self.ocr_engine.recognize(frame, self.lang)
+
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
+        page_num = self.start_page
+        async for text in self.ocr_engine.ordered(self._page_jobs()):
+            yield BookPageModel(
+                file_path=self.file_path,
+                book_name=self.file_path,
+                page_number=page_num,
+                page_content=text,
+            )
+            page_num += 1
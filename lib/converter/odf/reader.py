@@ -0,0 +1,44 @@
+import zipfile
+from typing import Iterator
+from xml.etree.ElementTree import Element, iterparse
+
+from lib.converter.base import BlockConverter
+
+TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+
+
+def _odf_text(element: Element) -> str:
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == f"{TEXT}tab":
+            parts.append("\t")
+        elif child.tag == f"{TEXT}line-break":
+            parts.append("\n")
+        elif child.tag == f"{TEXT}s":
+            parts.append(" " * int(child.get(f"{TEXT}c", "1")))
+        else:
+            parts.append(_odf_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def iter_odt_blocks(stream) -> Iterator[str]:
+    blocks = (f"{TEXT}p", f"{TEXT}h")
+    with zipfile.ZipFile(stream) as archive:
+        with archive.open("content.xml") as xml:
+            depth = 0
+            for event, element in iterparse(xml, events=("start", "end")):
+                if element.tag not in blocks:
+                    continue
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if not depth:
+                    yield _odf_text(element)
+                    element.clear()
+
+
+class OdtReader(BlockConverter):
+    def iter_blocks(self) -> Iterator[str]:
+        return iter_odt_blocks(self.content_stream())
@@ -1,12 +1,11 @@
-import asyncio
-from typing import List
-from pypdf import PdfWriter
-from pdf2image import convert_from_bytes
-import pytesseract
-import io
+from typing import AsyncIterator, Optional
 
+from core.settings import settings
 from db.typesense.models import BookPageModel
 from lib.converter.pdf.base_reader import BasePdfConverter
+from lib.converter.pdf.rasterizer import PdfRasterizer
+from lib.ocr.engine import OcrEngine, get_ocr_engine
+from lib.ocr.profiles import OcrProfile, get_ocr_profile
 from lib.typesense.client import AsyncClient
 
 
@@ -16,6 +15,11 @@ class PdfImageConverter(BasePdfConverter):
     ):
         super().__init__(client, project_name, file_path, *args, **kwargs)
         self.lang: str = kwargs.get("lang", "eng")
+        self.ocr_engine: OcrEngine = kwargs.get("ocr_engine") or get_ocr_engine()
+        self.adaptive: bool = kwargs.get("ocr_adaptive", settings.ocr_adaptive)
+        self.profile: OcrProfile = (
+            get_ocr_profile("fast") if self.adaptive else self.ocr_engine.profile
+        )
 
     async def get_title(self) -> str:
         if self.reader.metadata and self.reader.metadata.title:
@@ -25,35 +29,47 @@ class PdfImageConverter(BasePdfConverter):
         lines = text.split("\n")
         return next((line.strip() for line in lines if line.strip()), "")
 
-    async def _pages_chunk(self):
-        total_pages = self.reader.get_num_pages()
-        for i in range(0, total_pages, self._chunk_size):
-            writer = PdfWriter()
-            for j in range(i, min(i + self._chunk_size, total_pages)):
-                writer.add_page(self.reader.get_page(j))
-            buffer = io.BytesIO()
-            writer.write(buffer)
-            yield buffer.getvalue()
-            buffer.close()
-
-    async def collect_pages(self) -> List[BookPageModel]:
-        book_name = await self.get_title() or self.file_name
-        pages = []
-        loop = asyncio.get_running_loop()
+    def rasterizer(
+        self, path: str, profile: Optional[OcrProfile] = None
+    ) -> PdfRasterizer:
+        profile = profile or self.profile
+        return PdfRasterizer(
+            path,
+            dpi=profile.dpi,
+            grayscale=profile.grayscale,
+            thread_count=settings.ocr_render_threads,
+            batch_size=settings.ocr_render_batch_size,
+        )
 
-        async for bytes_chunk in self._pages_chunk():
-            pdf_images = await loop.run_in_executor(None, convert_from_bytes, bytes_chunk)
+    async def _recognize_page(self, path: str, page_number: int, image=None) -> str:
+        if image is None:
+            image = await self.rasterizer(path).render_page(page_number)
+        if not self.adaptive:
+            return await self.ocr_engine.recognize(image, self.lang, self.profile)
+        text, confidence = await self.ocr_engine.recognize_with_confidence(
+            image, self.lang, self.profile
+        )
+        if confidence >= settings.ocr_adaptive_min_confidence:
+            return text
+        retry_profile = get_ocr_profile("accurate")
+        image = await self.rasterizer(path, retry_profile).render_page(page_number)
+        return await self.ocr_engine.recognize(image, self.lang, retry_profile)
 
-            for page_num, image in enumerate(pdf_images, start=1):
-                text = await loop.run_in_executor(
-                    None, pytesseract.image_to_string, image, self.lang
-                )
-                pages.append(
-                    BookPageModel(
-                        file_path=self.file_path,
-                        book_name=book_name,
-                        page_number=page_num,
-                        page_content=text,
-                    )
+    async def _page_jobs(self, path: str):
+        async for page_number, image in self.rasterizer(path).pages(
+            self.start_page, len(self.reader.pages)
+        ):
+            yield self._recognize_page(path, page_number, image)
+
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
+        book_name = await self.get_title() or self.file_name
+        page_num = self.start_page
+        async with self.materialize() as path:
+            async for text in self.ocr_engine.ordered(self._page_jobs(path)):
+                yield BookPageModel(
+                    file_path=self.file_path,
+                    book_name=book_name,
+                    page_number=page_num,
+                    page_content=text,
                 )
-        return pages
+                page_num += 1
@@ -0,0 +1,25 @@
+from core.settings import settings
+from lib.converter.pdf.img_reader import PdfImageConverter
+from lib.converter.pdf.text_reader import PdfTextConverter
+
+
+async def _extracted(text: str) -> str:
+    return text
+
+
+class PdfMixedConverter(PdfImageConverter, PdfTextConverter):
+    """
+    Uses the embedded text of every page that has at least ``_text_threshold``
+    characters and OCRs only the remaining pages.
+    """
+
+    _text_threshold = settings.pdf_text_threshold
+
+    async def _page_jobs(self, path: str):
+        page_number = self.start_page
+        async for text in self.extract_texts(self.start_page - 1):
+            if len(text.strip()) >= self._text_threshold:
+                yield _extracted(text)
+            else:
+                yield self._recognize_page(path, page_number)
+            page_number += 1
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, List, Tuple
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+
+class PdfRasterizer:
+    """
+    Renders pages straight from a PDF file on disk. Pages are rendered by
+    poppler in batches of ``batch_size`` into a temporary folder and loaded
+    one at a time, so only the page being handed out is kept in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dpi: int = 200,
+        grayscale: bool = False,
+        thread_count: int = 1,
+        batch_size: int = 4,
+    ):
+        self.path = path
+        self.dpi = dpi
+        self.grayscale = grayscale
+        self.thread_count = thread_count
+        self.batch_size = max(batch_size, 1)
+
+    def _sync_render(
+        self, first_page: int, last_page: int, output_folder: str
+    ) -> List[str]:
+        return convert_from_path(
+            self.path,
+            dpi=self.dpi,
+            first_page=first_page,
+            last_page=last_page,
+            grayscale=self.grayscale,
+            thread_count=self.thread_count,
+            output_folder=output_folder,
+            paths_only=True,
+        )
+
+    @staticmethod
+    def _sync_load(image_path: str) -> Image.Image:
+        with Image.open(image_path) as image:
+            image.load()
+            loaded = image.copy()
+        os.remove(image_path)
+        return loaded
+
+    async def render_page(self, page_number: int) -> Image.Image:
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory() as output_folder:
+            image_paths = await loop.run_in_executor(
+                None, self._sync_render, page_number, page_number, output_folder
+            )
+            return await loop.run_in_executor(None, self._sync_load, image_paths[0])
+
+    async def pages(
+        self, first_page: int, last_page: int
+    ) -> AsyncIterator[Tuple[int, Image.Image]]:
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory() as output_folder:
+            for start in range(first_page, last_page + 1, self.batch_size):
+                stop = min(start + self.batch_size - 1, last_page)
+                image_paths = await loop.run_in_executor(
+                    None, self._sync_render, start, stop, output_folder
+                )
+                for page_number, image_path in enumerate(image_paths, start=start):
+                    image = await loop.run_in_executor(None, self._sync_load, image_path)
+                    yield page_number, image
@@ -1,10 +1,38 @@
-from typing import List
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Deque, List
 
+from pypdf import PdfReader
+
+from core.settings import settings
 from db.typesense.models import BookPageModel
 from lib.converter.pdf.base_reader import BasePdfConverter
 
 
+def _extract_text_range(path: str, start: int, stop: int) -> List[str]:
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def get_text_workers() -> int:
+    return settings.pdf_text_workers or os.cpu_count() or 1
+
+
+@lru_cache
+def get_text_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=get_text_workers(),
+        mp_context=multiprocessing.get_context("forkserver"),
+    )
+
+
 class PdfTextConverter(BasePdfConverter):
+    _pages_per_job = settings.pdf_text_pages_per_job
+
     async def get_title(self) -> str:
         if self.reader.metadata.title:
             return self.reader.metadata.title
@@ -13,17 +41,51 @@ class PdfTextConverter(BasePdfConverter):
         lines = text.split("\n")
         return next((line.strip() for line in lines if line.strip()), "")
 
-    async def collect_pages(self) -> List[BookPageModel]:
+    def _sync_extract_texts(self, start: int, stop: int) -> List[str]:
+        return [self.reader.pages[i].extract_text() for i in range(start, stop)]
+
+    async def extract_texts(self, first: int = 0) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        total_pages = len(self.reader.pages)
+        if total_pages - first <= self._pages_per_job:
+            for text in await loop.run_in_executor(
+                None, self._sync_extract_texts, first, total_pages
+            ):
+                yield text
+            return
+
+        executor = get_text_executor()
+        async with self.materialize() as path:
+            in_flight: Deque[asyncio.Future] = deque()
+            try:
+                for start in range(first, total_pages, self._pages_per_job):
+                    in_flight.append(
+                        loop.run_in_executor(
+                            executor,
+                            _extract_text_range,
+                            path,
+                            start,
+                            min(start + self._pages_per_job, total_pages),
+                        )
+                    )
+                    if len(in_flight) >= get_text_workers() * 2:
+                        for text in await in_flight.popleft():
+                            yield text
+                while in_flight:
+                    for text in await in_flight.popleft():
+                        yield text
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
         book_name = await self.get_title() or self.file_name
-        pages = list()
-        for page_num, page in enumerate(self.reader.pages, start=1):
-            text = page.extract_text()
-            pages.append(
-                BookPageModel(
-                    file_path=self.file_path,
-                    book_name=book_name,
-                    page_number=page_num,
-                    page_content=text,
-                )
+        page_num = self.start_page
+        async for text in self.extract_texts(self.start_page - 1):
+            yield BookPageModel(
+                file_path=self.file_path,
+                book_name=book_name,
+                page_number=page_num,
+                page_content=text,
             )
-        return pages
+            page_num += 1
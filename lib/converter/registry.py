@@ -0,0 +1,135 @@
+import zipfile
+from typing import IO, Dict, Iterable, Type
+
+import puremagic
+
+from db.typesense.models import ConverterCost
+from lib.converter.base import BaseConverter
+from lib.converter.epub.reader import EpubReader
+from lib.converter.image.reader import ImageReader
+from lib.converter.odf.reader import OdtReader
+from lib.converter.pdf.reader import PdfReader
+from lib.converter.text.reader import HtmlReader, PlainTextReader, RtfReader
+from lib.converter.word.reader import DocReader, WordReader
+
+DOCX_MIME_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+
+
+class ConverterRegistry:
+    _sniff_size = 4096
+
+    def __init__(self):
+        self._by_mime_type: Dict[str, Type[BaseConverter]] = dict()
+        self._by_extension: Dict[str, Type[BaseConverter]] = dict()
+
+    def register(
+        self,
+        converter_cls: Type[BaseConverter],
+        extensions: Iterable[str] = (),
+        mime_types: Iterable[str] = (),
+    ):
+        for extension in extensions:
+            self._by_extension[extension.lower()] = converter_cls
+        for mime_type in mime_types:
+            self._by_mime_type[mime_type.lower()] = converter_cls
+
+    @staticmethod
+    def _sniff_zip(stream: IO[bytes]) -> str:
+        try:
+            with zipfile.ZipFile(stream) as archive:
+                names = set(archive.namelist())
+                if "mimetype" in names:
+                    return archive.read("mimetype").decode("ascii", "ignore").strip()
+                if "word/document.xml" in names:
+                    return DOCX_MIME_TYPE
+        except zipfile.BadZipFile:
+            pass
+        return ""
+
+    def sniff_mime_type(self, stream: IO[bytes]) -> str:
+        stream.seek(0)
+        head = stream.read(self._sniff_size)
+        stream.seek(0)
+        if head.startswith(b"PK\x03\x04"):
+            mime_type = self._sniff_zip(stream)
+            stream.seek(0)
+            return mime_type
+        try:
+            matches = puremagic.magic_string(head)
+        except puremagic.PureError:
+            return ""
+        return next((match.mime_type for match in matches if match.mime_type), "")
+
+    def _looks_like_text(self, stream: IO[bytes]) -> bool:
+        stream.seek(0)
+        head = stream.read(self._sniff_size)
+        stream.seek(0)
+        if not head or b"\x00" in head:
+            return False
+        try:
+            head.decode("utf-8")
+        except UnicodeDecodeError as e:
+            # the sniffed block may end in the middle of a multibyte character
+            return e.start >= len(head) - 3
+        return True
+
+    def _by_name(self, file_name: str):
+        if "." not in file_name:
+            return None
+        return self._by_extension.get(file_name.rsplit(".", 1)[-1].lower())
+
+    def detect(
+        self, stream: IO[bytes], file_name: str = "", mime_type: str = ""
+    ) -> Type[BaseConverter]:
+        """
+        Pick a converter by the content magic bytes first, then by the
+        provider mime type, then by the file extension. Content that is
+        valid UTF-8 falls back to plain text.
+        """
+        sniffed = self.sniff_mime_type(stream)
+        converter_cls = (
+            self._by_mime_type.get(sniffed.lower())
+            or self._by_mime_type.get(mime_type.lower())
+            or self._by_name(file_name)
+        )
+        if not converter_cls and self._looks_like_text(stream):
+            converter_cls = self._by_mime_type["text/plain"]
+        if not converter_cls:
+            raise ValueError(
+                f"Unsupported file format {file_name} ({sniffed or mime_type})"
+            )
+        return converter_cls
+
+    def get_cost(self, file_name: str = "", mime_type: str = "") -> ConverterCost:
+        converter_cls = self._by_mime_type.get(mime_type.lower()) or self._by_name(
+            file_name
+        )
+        if not converter_cls:
+            return ConverterCost.expensive
+        return converter_cls.cost
+
+
+converter_registry = ConverterRegistry()
+converter_registry.register(PdfReader, ["pdf"], ["application/pdf"])
+converter_registry.register(WordReader, ["docx"], [DOCX_MIME_TYPE])
+converter_registry.register(DocReader, ["doc"], ["application/msword"])
+converter_registry.register(
+    PlainTextReader,
+    ["txt", "text", "md", "markdown", "csv", "log"],
+    ["text/plain", "text/markdown", "text/x-markdown", "text/csv"],
+)
+converter_registry.register(
+    HtmlReader, ["html", "htm", "xhtml"], ["text/html", "application/xhtml+xml"]
+)
+converter_registry.register(RtfReader, ["rtf"], ["application/rtf", "text/rtf"])
+converter_registry.register(
+    OdtReader, ["odt"], ["application/vnd.oasis.opendocument.text"]
+)
+converter_registry.register(EpubReader, ["epub"], ["application/epub+zip"])
+converter_registry.register(
+    ImageReader,
+    ["png", "jpg", "jpeg", "tif", "tiff", "bmp", "gif", "webp"],
+    ["image/png", "image/jpeg", "image/tiff", "image/bmp", "image/gif", "image/webp"],
+)
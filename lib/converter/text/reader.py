@@ -0,0 +1,232 @@
+import codecs
+import io
+import re
+from html.parser import HTMLParser
+from typing import Iterator, List
+
+from lib.converter.base import BlockConverter
+
+
+class PlainTextReader(BlockConverter):
+    _read_size = 64 * 1024
+
+    def iter_lines(self) -> Iterator[str]:
+        stream = io.TextIOWrapper(
+            self.content_stream(), encoding="utf-8", errors="replace"
+        )
+        try:
+            for line in stream:
+                yield line.rstrip("\r\n")
+        finally:
+            stream.detach()
+
+    def iter_blocks(self) -> Iterator[str]:
+        return self.iter_lines()
+
+
+class HtmlTextParser(HTMLParser):
+    _skip_tags = {"script", "style", "head", "title", "noscript"}
+    _block_tags = {
+        "p",
+        "div",
+        "br",
+        "li",
+        "tr",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "section",
+        "article",
+        "blockquote",
+        "pre",
+        "table",
+        "ul",
+        "ol",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        # set once the title is read or the body starts without one
+        self.head_done = False
+        self._in_title = False
+        self._skip_depth = 0
+        self._parts: List[str] = list()
+        self._blocks: List[str] = list()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "body":
+            self.head_done = True
+        if tag in self._skip_tags:
+            self._skip_depth += 1
+        elif tag in self._block_tags:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+            self.head_done = True
+        if tag in self._skip_tags:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self._block_tags:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._parts).split())
+        if text:
+            self._blocks.append(text)
+        self._parts = list()
+
+    def pop_blocks(self) -> List[str]:
+        blocks, self._blocks = self._blocks, list()
+        return blocks
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def iter_html_blocks(chunks: Iterator[str]) -> Iterator[str]:
+    parser = HtmlTextParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_blocks()
+    parser.close()
+    yield from parser.pop_blocks()
+
+
+class HtmlReader(PlainTextReader):
+    def iter_chunks(self) -> Iterator[str]:
+        stream = io.TextIOWrapper(
+            self.content_stream(), encoding="utf-8", errors="replace"
+        )
+        try:
+            while chunk := stream.read(self._read_size):
+                yield chunk
+        finally:
+            stream.detach()
+
+    def get_book_name(self) -> str:
+        parser = HtmlTextParser()
+        chunks = self.iter_chunks()
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+                if parser.head_done:
+                    break
+        finally:
+            chunks.close()
+        return " ".join(parser.title.split()) or super().get_book_name()
+
+    def iter_blocks(self) -> Iterator[str]:
+        return iter_html_blocks(self.iter_chunks())
+
+
+class RtfReader(PlainTextReader):
+    _token_re = re.compile(
+        r"\\([a-z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)",
+        re.IGNORECASE,
+    )
+    _destinations = {
+        "fonttbl",
+        "colortbl",
+        "stylesheet",
+        "info",
+        "pict",
+        "header",
+        "footer",
+        "headerl",
+        "headerr",
+        "footerl",
+        "footerr",
+        "xmlnstbl",
+        "listtable",
+        "listoverridetable",
+        "rsidtbl",
+        "generator",
+        "themedata",
+        "datastore",
+        "latentstyles",
+        "object",
+        "fldinst",
+        "filetbl",
+        "revtbl",
+    }
+    _specials = {"par": "\n", "line": "\n", "tab": "\t", "sect": "\n", "page": "\n"}
+
+    @staticmethod
+    def _codepage(arg: str, default: str) -> str:
+        try:
+            return codecs.lookup(f"cp{int(arg)}").name
+        except (TypeError, ValueError, LookupError):
+            return default
+
+    def rtf_to_text(self, rtf: str) -> str:
+        stack = list()
+        ignorable = False
+        unicode_skip = 1
+        skip = 0
+        codepage = "cp1252"
+        parts = list()
+        for match in self._token_re.finditer(rtf):
+            word, arg, hex_code, char, brace, text = match.groups()
+            if brace:
+                skip = 0
+                if brace == "{":
+                    stack.append((unicode_skip, ignorable))
+                elif stack:
+                    unicode_skip, ignorable = stack.pop()
+            elif char:
+                skip = 0
+                if char == "~":
+                    if not ignorable:
+                        parts.append("\xa0")
+                elif char in "{}\\":
+                    if not ignorable:
+                        parts.append(char)
+                elif char == "*":
+                    ignorable = True
+            elif word:
+                skip = 0
+                word = word.lower()
+                if word in self._destinations:
+                    ignorable = True
+                elif ignorable:
+                    pass
+                elif word == "ansicpg":
+                    codepage = self._codepage(arg, codepage)
+                elif word in self._specials:
+                    parts.append(self._specials[word])
+                elif word == "uc":
+                    # a bare \uc falls back to the RTF default
+                    unicode_skip = int(arg) if arg else 1
+                elif word == "u" and arg:
+                    # a signed 16-bit value
+                    parts.append(chr(int(arg) & 0xFFFF))
+                    skip = unicode_skip
+            elif hex_code:
+                if skip > 0:
+                    skip -= 1
+                elif not ignorable:
+                    parts.append(bytes.fromhex(hex_code).decode(codepage, "replace"))
+            elif text:
+                if skip > 0:
+                    skip -= 1
+                elif not ignorable:
+                    parts.append(text)
+        return "".join(parts)
+
+    def iter_blocks(self) -> Iterator[str]:
+        rtf = "\n".join(self.iter_lines())
+        return iter(self.rtf_to_text(rtf).splitlines())
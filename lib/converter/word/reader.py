@@ -1,54 +1,126 @@
-import asyncio
-import io
-from typing import List
-from docx import Document
+import subprocess
+import zipfile
+from typing import AsyncIterator, Iterator
+from xml.etree.ElementTree import Element, iterparse
 
 from db.typesense.models import BookPageModel
-from lib.converter.base import BaseConverter
-
-
-class WordReader(BaseConverter):
-    _chars_per_page = 3300
-
-    async def load_content(self):
-        await super().load_content()
-        loop = asyncio.get_running_loop()
-        pdf_io = io.BytesIO(self.content)
-        self.reader = await loop.run_in_executor(None, Document, pdf_io)
-
-    async def collect_pages(self) -> List[BookPageModel]:
-        book_name = self.file_path
-        pages = list()
-        page_num = 1
-        current_text = ""
-        char_count = 0
-
-        for para in self.reader.paragraphs:
-            para_text = para.text + "\n"
-            char_count += len(para_text)
-            current_text += para_text
-
-            if char_count >= self._chars_per_page:
-                pages.append(
-                    BookPageModel(
-                        file_path=self.file_path,
-                        book_name=book_name,
-                        page_number=page_num,
-                        page_content=current_text.strip(),
-                    )
-                )
-                page_num += 1
-                current_text = ""
-                char_count = 0
-
-        if current_text.strip():
-            pages.append(
-                BookPageModel(
-                    file_path=self.file_path,
-                    book_name=book_name,
-                    page_number=page_num,
-                    page_content=current_text.strip(),
+from lib.converter.base import BlockConverter
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _paragraph_text(element: Element) -> str:
+    parts = list()
+    for node in element.iter():
+        if node.tag == f"{W}t":
+            parts.append(node.text or "")
+        elif node.tag == f"{W}tab":
+            parts.append("\t")
+        elif node.tag in (f"{W}br", f"{W}cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _block_texts(element: Element) -> Iterator[str]:
+    for child in element:
+        if child.tag == f"{W}p":
+            yield _paragraph_text(child)
+        elif child.tag == f"{W}tbl":
+            yield _table_text(child)
+        else:
+            yield from _block_texts(child)
+
+
+def _table_text(element: Element) -> str:
+    # only the table's own rows and cells, nested tables render themselves
+    rows = list()
+    for row in element.findall(f"{W}tr"):
+        cells = [" ".join(_block_texts(cell)).strip() for cell in row.findall(f"{W}tc")]
+        rows.append("\t".join(cells))
+    return "\n".join(rows)
+
+
+def iter_docx_blocks(stream) -> Iterator[str]:
+    """
+    Yield the text of body paragraphs and tables in document order, followed
+    by footnotes, endnotes, headers and footers, without building the whole
+    document tree.
+    """
+    with zipfile.ZipFile(stream) as archive:
+        names = set(archive.namelist())
+        parts = ["word/document.xml", "word/footnotes.xml", "word/endnotes.xml"]
+        for prefix in ("word/header", "word/footer"):
+            parts.extend(
+                sorted(
+                    name
+                    for name in names
+                    if name.startswith(prefix) and name.endswith(".xml")
                 )
             )
+        for part in parts:
+            if part not in names:
+                continue
+            with archive.open(part) as xml:
+                table_depth = 0
+                # open elements, so finished blocks can be detached from
+                # their parent instead of piling up under w:body
+                parents = list()
+                for event, element in iterparse(xml, events=("start", "end")):
+                    if event == "start":
+                        parents.append(element)
+                        if element.tag == f"{W}tbl":
+                            table_depth += 1
+                        continue
+                    parents.pop()
+                    if element.tag == f"{W}tbl":
+                        table_depth -= 1
+                        if table_depth:
+                            continue
+                        yield _table_text(element)
+                    elif element.tag == f"{W}p" and not table_depth:
+                        yield _paragraph_text(element)
+                    else:
+                        continue
+                    element.clear()
+                    if parents:
+                        parents[-1].remove(element)
+
+
+class WordReader(BlockConverter):
+    def iter_blocks(self) -> Iterator[str]:
+        return iter_docx_blocks(self.content_stream())
+
+
+class DocReader(WordReader):
+    """
+    Legacy binary .doc files, converted to text by a local antiword binary.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._path = ""
+
+    def iter_blocks(self) -> Iterator[str]:
+        process = subprocess.Popen(
+            ["antiword", "-m", "UTF-8.txt", "-w", "0", self._path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            errors="replace",
+        )
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+        finally:
+            process.stdout.close()
+            if process.wait():
+                raise ValueError(
+                    f"Failed to convert {self.file_path}: {process.stderr.read()}"
+                )
+            process.stderr.close()
 
-        return pages
+    async def collect_pages(self) -> AsyncIterator[BookPageModel]:
+        async with self.materialize() as path:
+            self._path = path
+            async for page in super().collect_pages():
+                yield page
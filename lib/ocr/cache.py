@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from PIL.Image import Image
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+class OcrCache:
+    """
+    On-disk OCR results keyed by rendered page hash, language and tesseract
+    config. The total size of stored texts is capped by ``max_size`` bytes,
+    least recently used pages are evicted first.
+
+    The cache is an optimization only: when the database can't be opened or
+    a query fails, pages are recognized without it.
+    """
+
+    _evict_batch = 100
+    # several runner replicas can share the file, the locally tracked size
+    # is re-read from the database this often and before every eviction
+    _recount_every = 100
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._connection: Optional[sqlite3.Connection] = None
+        self._total_size = 0
+        self._writes = 0
+        self.disabled = False
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_pages ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, accessed_at REAL NOT NULL, "
+                "confidence REAL NOT NULL DEFAULT -1)"
+            )
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(ocr_pages)")
+            }
+            if "confidence" not in columns:
+                connection.execute(
+                    "ALTER TABLE ocr_pages "
+                    "ADD COLUMN confidence REAL NOT NULL DEFAULT -1"
+                )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ocr_pages_accessed_at "
+                "ON ocr_pages (accessed_at)"
+            )
+            self._connection = connection
+            self._recount()
+        return self._connection
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        if self.disabled:
+            return None
+        try:
+            return self.connection
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"OCR cache {self.path} is unavailable, disabling it: {e}")
+            self.disabled = True
+            return None
+
+    def _recount(self):
+        self._total_size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM ocr_pages"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(image: Image, lang: str, config: str = "") -> str:
+        image_hash = hashlib.sha256()
+        image_hash.update(f"{image.mode}:{image.size}".encode())
+        image_hash.update(image.tobytes())
+        return f"{image_hash.hexdigest()}:{lang}:{config}"
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            connection = self._open()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(
+                    "SELECT text, confidence FROM ocr_pages WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                with connection:
+                    connection.execute(
+                        "UPDATE ocr_pages SET accessed_at = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"OCR cache lookup failed: {e}")
+                return None
+            return row[0], row[1]
+
+    def set(self, key: str, text: str, confidence: float = -1):
+        size = len(text.encode())
+        with self._lock:
+            connection = self._open()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    previous = connection.execute(
+                        "SELECT size FROM ocr_pages WHERE key = ?", (key,)
+                    ).fetchone()
+                    connection.execute(
+                        "INSERT OR REPLACE INTO ocr_pages "
+                        "(key, text, size, accessed_at, confidence) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, text, size, time.time(), confidence),
+                    )
+                    self._total_size += size - (previous[0] if previous else 0)
+                    self._writes += 1
+                    if (
+                        self._total_size > self.max_size
+                        or self._writes % self._recount_every == 0
+                    ):
+                        self._recount()
+                        self._evict()
+            except sqlite3.Error as e:
+                logger.warning(f"OCR cache write failed: {e}")
+
+    def _evict(self):
+        while self._total_size > self.max_size:
+            rows = self._connection.execute(
+                "SELECT key, size FROM ocr_pages ORDER BY accessed_at LIMIT ?",
+                (self._evict_batch,),
+            ).fetchall()
+            if not rows:
+                self._total_size = 0
+                return
+            for key, size in rows:
+                if self._total_size <= self.max_size:
+                    return
+                self._connection.execute("DELETE FROM ocr_pages WHERE key = ?", (key,))
+                self._total_size -= size
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,170 @@
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterable, AsyncIterator, Awaitable, Deque, Optional, Tuple
+
+import pytesseract
+from PIL.Image import Image
+
+from core.settings import settings
+from lib.ocr.cache import OcrCache
+from lib.ocr.profiles import OcrProfile, get_ocr_profile
+
+
+def _text_from_data(data: dict) -> str:
+    lines = list()
+    words = list()
+    line_key = None
+    for index, word in enumerate(data["text"]):
+        key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+        if key != line_key:
+            if words:
+                lines.append(" ".join(words))
+                if line_key[:2] != key[:2]:
+                    lines.append("")
+            words = list()
+            line_key = key
+        if word.strip():
+            words.append(word)
+    if words:
+        lines.append(" ".join(words))
+    return "\n".join(lines).strip()
+
+
+def _recognize(
+    image: Image,
+    lang: str,
+    config: str,
+    binarize: bool,
+    timeout: int,
+    with_confidence: bool,
+) -> Tuple[str, float]:
+    if binarize:
+        image = image.convert("L").point(lambda value: 255 if value > 160 else 0)
+    if not with_confidence:
+        text = pytesseract.image_to_string(
+            image, lang=lang, config=config, timeout=timeout
+        )
+        return text, -1
+    data = pytesseract.image_to_data(
+        image,
+        lang=lang,
+        config=config,
+        timeout=timeout,
+        output_type=pytesseract.Output.DICT,
+    )
+    confidences = [
+        float(confidence)
+        for word, confidence in zip(data["text"], data["conf"])
+        if word.strip() and float(confidence) >= 0
+    ]
+    confidence = sum(confidences) / len(confidences) if confidences else 0
+    return _text_from_data(data), confidence
+
+
+class OcrEngine:
+    def __init__(
+        self,
+        workers: int = 0,
+        page_timeout: int = 300,
+        cache: Optional[OcrCache] = None,
+        profile: Optional[OcrProfile] = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.page_timeout = page_timeout
+        self.cache = cache
+        self.profile = profile or get_ocr_profile("balanced")
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return self._executor
+
+    async def recognize_with_confidence(
+        self,
+        image: Image,
+        lang: str = "eng",
+        profile: Optional[OcrProfile] = None,
+        with_confidence: bool = True,
+    ) -> Tuple[str, float]:
+        profile = profile or self.profile
+        loop = asyncio.get_running_loop()
+        cache_key = None
+        if self.cache:
+            cache_key = await loop.run_in_executor(
+                None, self.cache.make_key, image, lang, profile.cache_config
+            )
+            cached = await loop.run_in_executor(None, self.cache.get, cache_key)
+            if cached is not None and (not with_confidence or cached[1] >= 0):
+                return cached
+        text, confidence = await loop.run_in_executor(
+            self.executor,
+            _recognize,
+            image,
+            lang,
+            profile.tesseract_config,
+            profile.binarize,
+            self.page_timeout,
+            with_confidence,
+        )
+        if self.cache:
+            await loop.run_in_executor(
+                None, self.cache.set, cache_key, text, confidence
+            )
+        return text, confidence
+
+    async def recognize(
+        self, image: Image, lang: str = "eng", profile: Optional[OcrProfile] = None
+    ) -> str:
+        text, _ = await self.recognize_with_confidence(
+            image, lang, profile, with_confidence=False
+        )
+        return text
+
+    async def ordered(self, jobs: AsyncIterable[Awaitable]) -> AsyncIterator:
+        """
+        Run page jobs as they arrive and yield their results in the original
+        order.
+
+        At most ``workers * 2`` jobs are kept in flight so rasterization does
+        not run far ahead of recognition.
+        """
+        in_flight: Deque[asyncio.Future] = deque()
+        try:
+            async for job in jobs:
+                in_flight.append(asyncio.ensure_future(job))
+                if len(in_flight) >= self.workers * 2:
+                    yield await in_flight.popleft()
+            while in_flight:
+                yield await in_flight.popleft()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self.cache:
+            self.cache.close()
+
+
+@lru_cache
+def get_ocr_engine() -> OcrEngine:
+    cache = None
+    if settings.ocr_cache_path:
+        cache = OcrCache(settings.ocr_cache_path, settings.ocr_cache_max_size)
+    return OcrEngine(
+        settings.ocr_workers,
+        settings.ocr_page_timeout,
+        cache,
+        get_ocr_profile(settings.ocr_profile),
+    )
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+
+
+class OcrProfile(BaseModel):
+    name: str
+    dpi: int
+    grayscale: bool = True
+    binarize: bool = False
+    tesseract_config: str = "--oem 1 --psm 3"
+
+    @property
+    def cache_config(self) -> str:
+        return f"{self.tesseract_config}:binarize={self.binarize}"
+
+
+OCR_PROFILES = {
+    "fast": OcrProfile(name="fast", dpi=150),
+    "balanced": OcrProfile(name="balanced", dpi=200),
+    "accurate": OcrProfile(name="accurate", dpi=300, binarize=True),
+}
+
+
+def get_ocr_profile(name: str) -> OcrProfile:
+    profile = OCR_PROFILES.get(name)
+    if not profile:
+        raise ValueError(f"Unsupported OCR profile: {name}")
+    return profile
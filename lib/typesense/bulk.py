@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Iterable, List, Optional, Tuple
+
+from typesense.exceptions import TypesenseClientError
+
+from core.settings import settings
+from lib.typesense.client import AsyncDocuments
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+CommitCallback = Callable[[List[dict]], Awaitable[None]]
+
+
+class BulkImportError(TypesenseClientError):
+    def __init__(self, failures: List[dict], transient: bool = False):
+        self.failures = failures
+        # every row was rejected only because Typesense was overloaded
+        self.transient = transient
+        errors = "; ".join(str(failure.get("error")) for failure in failures[:3])
+        super().__init__(f"{len(failures)} documents were not imported: {errors}")
+
+
+class BulkWriter:
+    """
+    Buffers documents and imports them in batches of ``batch_size``, with up
+    to ``concurrency`` import requests in flight. Rows rejected with a
+    retryable code are re-sent on their own, and ``on_commit`` is awaited
+    for every batch in the order the batches were added.
+    """
+
+    _retryable_codes = {429, 500, 503}
+
+    def __init__(
+        self,
+        documents: AsyncDocuments,
+        action: str = "upsert",
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        retries: Optional[int] = None,
+        on_commit: Optional[CommitCallback] = None,
+    ):
+        self.documents = documents
+        self.action = action
+        self.batch_size = max(batch_size or settings.typesense_import_batch_size, 1)
+        self.concurrency = max(concurrency or settings.typesense_import_concurrency, 1)
+        self.retries = settings.typesense_import_retries if retries is None else retries
+        self.on_commit = on_commit
+        self._buffer: List[dict] = list()
+        self._in_flight: Deque[Tuple[List[dict], asyncio.Task]] = deque()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def __aenter__(self) -> "BulkWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.flush()
+        else:
+            await self.cancel()
+
+    async def add(self, document: dict):
+        self._buffer.append(document)
+        if len(self._buffer) >= self.batch_size:
+            await self._send()
+
+    async def extend(self, documents: Iterable[dict]):
+        for document in documents:
+            await self.add(document)
+
+    async def flush(self):
+        if self._buffer:
+            await self._send()
+        while self._in_flight:
+            await self._commit_next()
+
+    async def cancel(self):
+        while self._in_flight:
+            _, task = self._in_flight.popleft()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _send(self):
+        batch, self._buffer = self._buffer, list()
+        await self._semaphore.acquire()
+        self._in_flight.append((batch, asyncio.create_task(self._import(batch))))
+        while self._in_flight and self._in_flight[0][1].done():
+            await self._commit_next()
+
+    async def _commit_next(self):
+        batch, task = self._in_flight[0]
+        try:
+            await task
+        except BaseException:
+            self._in_flight.popleft()
+            await self.cancel()
+            raise
+        self._in_flight.popleft()
+        if self.on_commit:
+            await self.on_commit(batch)
+
+    async def _import(self, batch: List[dict]):
+        try:
+            pending = batch
+            for attempt in range(self.retries + 1):
+                results = await self.documents.aimport_(
+                    pending, {"action": self.action}
+                )
+                failures = [
+                    (document, result)
+                    for document, result in zip(pending, results)
+                    if not result.get("success")
+                ]
+                retryable = [
+                    document
+                    for document, result in failures
+                    if result.get("code") in self._retryable_codes
+                ]
+                if len(retryable) < len(failures) or not retryable:
+                    break
+                if attempt < self.retries:
+                    logger.warning(
+                        f"Retrying {len(retryable)} of {len(batch)} documents for {self.documents.collection_name}"
+                    )
+                    await asyncio.sleep(2**attempt)
+                pending = retryable
+            if failures:
+                raise BulkImportError(
+                    [result for _, result in failures],
+                    transient=len(retryable) == len(failures),
+                )
+        finally:
+            self._semaphore.release()
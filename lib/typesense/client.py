@@ -1,39 +1,183 @@
 import asyncio
-import functools
+import json
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
 
+import aiohttp
 from pydantic import BaseModel
 
-from typesense import Client
-from typesense.api_call import ApiCall
-from typesense.collections import Collection, Collections
-from typesense.documents import Document, Documents
+from typesense.exceptions import (
+    HTTPStatus0Error,
+    ObjectAlreadyExists,
+    ObjectNotFound,
+    ObjectUnprocessable,
+    RequestForbidden,
+    RequestMalformed,
+    RequestUnauthorized,
+    ServerError,
+    ServiceUnavailable,
+    TypesenseClientError,
+)
 
 from db.typesense.models import BookPageModel
 
 
-class AsyncObjectGeneric:
-    def __getattr__(self, name):
-        if name[0] == "a":
-            method = getattr(self, name[1:], None)
-            if not method:
-                raise AttributeError(
-                    f"{self.__class__.__name__}, Attribute {name} not found"
-                )
+class AsyncApiCall:
+    _status_error_map = {
+        400: RequestMalformed,
+        401: RequestUnauthorized,
+        403: RequestForbidden,
+        404: ObjectNotFound,
+        409: ObjectAlreadyExists,
+        422: ObjectUnprocessable,
+        500: ServerError,
+        503: ServiceUnavailable,
+    }
 
-            @functools.wraps(method)
-            async def async_wrapper(*args, **kwargs):
-                loop = asyncio.get_running_loop()
-                return await loop.run_in_executor(None, method, *args, **kwargs)
+    def __init__(self, config_dict: dict):
+        self.api_key: str = config_dict["api_key"]
+        self.nodes: List[dict] = config_dict["nodes"]
+        self.num_retries: int = config_dict.get("num_retries", 3)
+        self.retry_interval_seconds: float = config_dict.get(
+            "retry_interval_seconds", 1.0
+        )
+        self.timeout = aiohttp.ClientTimeout(
+            total=config_dict.get("connection_timeout_seconds", 10)
+        )
+        self.pool_size: int = config_dict.get("connection_pool_size", 100)
+        self.keepalive_timeout: float = config_dict.get("keepalive_timeout_seconds", 60)
+        self._node_index = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=self.keepalive_timeout
+                ),
+                headers={"X-TYPESENSE-API-KEY": self.api_key},
+                timeout=self.timeout,
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _node_url(self) -> str:
+        node = self.nodes[self._node_index % len(self.nodes)]
+        if node.get("url"):
+            return node["url"].rstrip("/")
+        return (
+            f"{node['protocol']}://{node['host']}:{node['port']}{node.get('path', '')}"
+        )
+
+    @staticmethod
+    def _prepare_params(params: Optional[dict]) -> Optional[Dict[str, str]]:
+        if not params:
+            return None
+        prepared = dict()
+        for key, value in params.items():
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            elif isinstance(value, (list, tuple)):
+                value = ",".join(str(item) for item in value)
+            prepared[key] = str(value)
+        return prepared
+
+    async def _raise_for_status(self, response: aiohttp.ClientResponse):
+        if response.status < 400:
+            return
+        try:
+            message = (await response.json(content_type=None)).get("message", "")
+        except (ValueError, aiohttp.ContentTypeError):
+            message = await response.text()
+        error_cls = self._status_error_map.get(
+            response.status,
+            ServerError if response.status >= 500 else TypesenseClientError,
+        )
+        raise error_cls(f"[Errno {response.status}] {message}")
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[dict] = None,
+        body: Any = None,
+        data: Optional[str] = None,
+        as_json: bool = True,
+    ) -> Any:
+        last_error: Exception = HTTPStatus0Error("No Typesense nodes configured")
+        for attempt in range(self.num_retries + 1):
+            try:
+                async with self.session.request(
+                    method,
+                    f"{self._node_url()}{endpoint}",
+                    params=self._prepare_params(params),
+                    json=body,
+                    data=data,
+                ) as response:
+                    await self._raise_for_status(response)
+                    if as_json:
+                        return await response.json(content_type=None)
+                    return await response.text()
+            except (
+                aiohttp.ClientConnectionError,
+                asyncio.TimeoutError,
+                ServerError,
+                ServiceUnavailable,
+            ) as e:
+                last_error = e
+                self._node_index += 1
+                if attempt < self.num_retries:
+                    await asyncio.sleep(self.retry_interval_seconds)
+        raise last_error
+
+    async def get(self, endpoint: str, params: Optional[dict] = None, **kwargs):
+        return await self.request("GET", endpoint, params=params, **kwargs)
+
+    async def post(
+        self, endpoint: str, body: Any = None, params: Optional[dict] = None, **kwargs
+    ):
+        return await self.request("POST", endpoint, params=params, body=body, **kwargs)
+
+    async def patch(
+        self, endpoint: str, body: Any = None, params: Optional[dict] = None, **kwargs
+    ):
+        return await self.request("PATCH", endpoint, params=params, body=body, **kwargs)
+
+    async def delete(self, endpoint: str, params: Optional[dict] = None, **kwargs):
+        return await self.request("DELETE", endpoint, params=params, **kwargs)
+
+
+class AsyncDocument:
+    def __init__(self, api_call: AsyncApiCall, collection_name: str, document_id: str):
+        self.api_call = api_call
+        self.collection_name = collection_name
+        self.document_id = document_id
+
+    @property
+    def endpoint(self) -> str:
+        return f"/collections/{quote(self.collection_name, safe='')}/documents/{quote(str(self.document_id), safe='')}"
 
-            return async_wrapper
-        raise AttributeError(f"{self.__class__.__name__}, Attribute {name} not found")
+    async def aretrieve(self) -> dict:
+        return await self.api_call.get(self.endpoint)
 
+    async def aupdate(self, document: dict, params: Optional[dict] = None) -> dict:
+        return await self.api_call.patch(self.endpoint, document, params)
 
-class AsyncDocument(Document, AsyncObjectGeneric):
-    pass
+    async def adelete(self) -> dict:
+        return await self.api_call.delete(self.endpoint)
 
 
-class AsyncDocuments(Documents, AsyncObjectGeneric):
+class AsyncDocuments:
+    def __init__(self, api_call: AsyncApiCall, collection_name: str):
+        self.api_call = api_call
+        self.collection_name = collection_name
+        self.documents: Dict[str, AsyncDocument] = dict()
+
     def __getitem__(self, document_id: str) -> AsyncDocument:
         if document_id not in self.documents:
             self.documents[document_id] = AsyncDocument(
@@ -42,14 +186,64 @@ class AsyncDocuments(Documents, AsyncObjectGeneric):
 
         return self.documents[document_id]
 
+    @property
+    def endpoint(self) -> str:
+        return f"/collections/{quote(self.collection_name, safe='')}/documents"
+
+    async def acreate(self, document: dict, params: Optional[dict] = None) -> dict:
+        return await self.api_call.post(self.endpoint, document, params)
+
+    async def aupsert(self, document: dict) -> dict:
+        return await self.api_call.post(self.endpoint, document, {"action": "upsert"})
+
+    async def aimport_(
+        self, documents: List[dict], params: Optional[dict] = None
+    ) -> List[dict]:
+        if not documents:
+            return list()
+        response = await self.api_call.post(
+            f"{self.endpoint}/import",
+            params=params,
+            data="\n".join(json.dumps(document) for document in documents),
+            as_json=False,
+        )
+        return [json.loads(line) for line in response.splitlines() if line]
+
+    async def aupdate(self, document: dict, params: dict) -> dict:
+        return await self.api_call.patch(self.endpoint, document, params)
 
-class AsyncCollection(Collection, AsyncObjectGeneric):
-    def __init__(self, api_call: ApiCall, name: str):
-        super().__init__(api_call, name)
+    async def asearch(self, search_parameters: dict) -> dict:
+        return await self.api_call.get(f"{self.endpoint}/search", search_parameters)
+
+    async def adelete(self, params: Optional[dict] = None) -> dict:
+        return await self.api_call.delete(self.endpoint, params)
+
+
+class AsyncCollection:
+    def __init__(self, api_call: AsyncApiCall, name: str):
+        self.api_call = api_call
+        self.name = name
         self.documents: AsyncDocuments = AsyncDocuments(api_call, name)
 
+    @property
+    def endpoint(self) -> str:
+        return f"/collections/{quote(self.name, safe='')}"
+
+    async def aretrieve(self) -> dict:
+        return await self.api_call.get(self.endpoint)
+
+    async def aupdate(self, schema_change: dict) -> dict:
+        return await self.api_call.patch(self.endpoint, schema_change)
+
+    async def adelete(self) -> dict:
+        return await self.api_call.delete(self.endpoint)
+
+
+class AsyncCollections:
+    def __init__(self, api_call: AsyncApiCall):
+        self.api_call = api_call
+        self.collections: Dict[str, AsyncCollection] = dict()
 
-class AsyncCollections(Collections, AsyncObjectGeneric):
     def __getitem__(self, collection_name: str) -> AsyncCollection:
         if not self.collections.get(collection_name):
             self.collections[collection_name] = AsyncCollection(
@@ -57,19 +251,91 @@ class AsyncCollections(Collections, AsyncObjectGeneric):
             )
         return self.collections[collection_name]
 
+    async def acreate(self, schema: dict) -> dict:
+        return await self.api_call.post("/collections", schema)
+
+    async def aretrieve(self) -> List[dict]:
+        return await self.api_call.get("/collections")
+
+
+class AsyncMultiSearch:
+    def __init__(self, api_call: AsyncApiCall):
+        self.api_call = api_call
+
+    async def aperform(
+        self, search_queries: dict, common_params: Optional[dict] = None
+    ) -> dict:
+        return await self.api_call.post("/multi_search", search_queries, common_params)
+
 
-class AsyncClient(Client, AsyncObjectGeneric):
+class AsyncClient:
     _TYPES_MAP = {str: "string", int: "int64"}
 
     def __init__(self, config_dict):
-        super().__init__(config_dict)
+        self.config = config_dict
+        self.api_call = AsyncApiCall(config_dict)
         self.collections: AsyncCollections = AsyncCollections(self.api_call)
+        self.multi_search: AsyncMultiSearch = AsyncMultiSearch(self.api_call)
+
+    @classmethod
+    def from_settings(cls, settings) -> "AsyncClient":
+        return cls(
+            {
+                "api_key": settings.typesense_api_key,
+                "nodes": [
+                    {
+                        "host": settings.typesense_host,
+                        "port": settings.typesense_port,
+                        "protocol": settings.typesense_protocol,
+                    }
+                ],
+                "connection_timeout_seconds": 10,
+                "connection_pool_size": settings.typesense_connection_pool_size,
+            }
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.api_call.close()
+
+    async def health(self) -> bool:
+        res = await self.api_call.get("/health")
+        return bool(res.get("ok"))
 
     def get_collection_fields_from_model(self, model: BaseModel):
-        return [
-            {"name": name, "type": self._TYPES_MAP.get(field.annotation, "string")}
-            for name, field in model.model_fields.items()
-        ]
+        facet_fields = getattr(model.Config, "facet_fields", ())
+        fields = list()
+        for name, field in model.model_fields.items():
+            schema_field = {
+                "name": name,
+                "type": self._TYPES_MAP.get(field.annotation, "string"),
+            }
+            if name in facet_fields:
+                schema_field["facet"] = True
+            fields.append(schema_field)
+        return fields
+
+    async def sync_collection_fields(
+        self, collection_name: str, model: BaseModel = BookPageModel
+    ):
+        collection = await self.collections[collection_name].aretrieve()
+        existing = {field["name"]: field for field in collection["fields"]}
+        changes = list()
+        for field in self.get_collection_fields_from_model(model):
+            current = existing.get(field["name"])
+            if current is None:
+                changes.append({**field, "optional": True})
+            elif field.get("facet") and not current.get("facet"):
+                # the facet flag can't be altered in place, the field is re-indexed
+                changes.append({"name": field["name"], "drop": True})
+                changes.append({**field, "optional": current.get("optional", False)})
+        if changes:
+            await self.collections[collection_name].aupdate({"fields": changes})
 
     async def create_collection(
         self, collection_name: str, model: BaseModel = BookPageModel
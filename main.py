@@ -1,9 +1,30 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from core.settings import settings
+from lib.typesense.client import AsyncClient
 from middlewares import AuthMiddleware
 from api.v1.router import router as v1_router
+from services.notify import task_notifier
+from services.search import TextSearch
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    client = AsyncClient.from_settings(settings)
+    try:
+        if settings.typesense_healthcheck_on_startup and not await client.health():
+            raise RuntimeError("Typesense is not healthy")
+        app.state.typesense_client = client
+        app.state.search_service = TextSearch(client=client, project_name="")
+        yield
+    finally:
+        await task_notifier.close()
+        await client.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(AuthMiddleware)
@@ -3,6 +3,8 @@ import argparse
 
 from core.settings import settings
 from lib.typesense.client import AsyncClient
+from db.typesense.models import ConverterCost
+from services.notify import task_notifier
 
 from tasks import task_runners
 
@@ -10,28 +12,34 @@ from tasks import task_runners
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Typesense client application")
     parser.add_argument("--task", help="Task type for running", required=True)
+    parser.add_argument(
+        "--concurrency",
+        help="Number of tasks processed at the same time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--lane",
+        help="Process only tasks of the given cost class",
+        choices=[cost.value for cost in ConverterCost],
+        default="",
+    )
     return parser.parse_args()
 
 
 async def main(args):
-    client = AsyncClient(
-        {
-            "api_key": settings.typesense_api_key,
-            "nodes": [
-                {
-                    "host": settings.typesense_host,
-                    "port": settings.typesense_port,
-                    "protocol": settings.typesense_protocol,
-                }
-            ],
-            "connection_timeout_seconds": 10,
-        }
-    )
+    client = AsyncClient.from_settings(settings)
     task_runner = next(
         (runner for runner in task_runners if runner._task_type == args.task), None
     )
-    task_runner_instance = task_runner(client)
-    await task_runner_instance.run()
+    task_runner_instance = task_runner(
+        client, concurrency=args.concurrency, lane=args.lane
+    )
+    try:
+        await task_runner_instance.run()
+    finally:
+        await task_notifier.close()
+        await client.close()
 
 
 if __name__ == "__main__":
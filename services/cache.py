@@ -0,0 +1,96 @@
+import time
+from typing import Any, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+from typesense.exceptions import ObjectAlreadyExists, ObjectNotFound
+
+from core.settings import settings
+from db.typesense.models import ProjectGenerationModel
+from lib.typesense.client import AsyncClient
+
+GENERATIONS_COLLECTION = "project_generations"
+
+
+class SearchCache:
+    """
+    In-process LRU cache with TTL for search results.
+
+    Every entry is stored together with the project generation it was
+    computed for. The generation is a marker document the upload pipeline
+    rewrites after every change to the project's pages, so results are
+    dropped as soon as pages are imported or replaced, even when that
+    happened in another process.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, revalidate_seconds: int):
+        self._results: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: TTLCache = TTLCache(maxsize=maxsize, ttl=revalidate_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(project_name: str, query: str, params: dict) -> Tuple[Hashable, ...]:
+        return (
+            project_name,
+            query,
+            tuple(sorted((key, str(value)) for key, value in params.items())),
+        )
+
+    def get_generation(self, project_name: str) -> Optional[int]:
+        return self._generations.get(project_name)
+
+    def set_generation(self, project_name: str, generation: int):
+        self._generations[project_name] = generation
+
+    def get(self, key: Tuple[Hashable, ...], generation: int) -> Optional[Any]:
+        entry = self._results.get(key)
+        if entry is not None and entry[0] == generation:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def set(self, key: Tuple[Hashable, ...], generation: int, value: Any):
+        self._results[key] = (generation, value)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._results),
+            "maxsize": self._results.maxsize,
+        }
+
+
+async def get_project_generation(client: AsyncClient, project_name: str) -> int:
+    try:
+        document = (
+            await client.collections[GENERATIONS_COLLECTION]
+            .documents[project_name]
+            .aretrieve()
+        )
+    except ObjectNotFound:
+        return 0
+    return document["generation"]
+
+
+async def bump_project_generation(client: AsyncClient, project_name: str):
+    document = {"id": project_name, "generation": time.time_ns()}
+    documents = client.collections[GENERATIONS_COLLECTION].documents
+    try:
+        await documents.aupsert(document)
+    except ObjectNotFound:
+        try:
+            await client.create_collection(
+                GENERATIONS_COLLECTION, ProjectGenerationModel
+            )
+        except ObjectAlreadyExists:
+            pass
+        await documents.aupsert(document)
+
+
+search_cache = SearchCache(
+    settings.search_cache_size,
+    settings.search_cache_ttl,
+    settings.search_cache_revalidate_seconds,
+)
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import threading
+from typing import IO, AsyncIterator, List, Optional, Tuple
+
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+
+from core.settings import settings
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+def build_drive_service():
+    credentials = service_account.Credentials.from_service_account_file(
+        settings.google_service_account_file,
+        scopes=["https://www.googleapis.com/auth/drive.readonly"],
+    )
+    return build("drive", "v3", credentials=credentials)
+
+
+class HashingWriter:
+    def __init__(self, stream: IO[bytes]):
+        self.stream = stream
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self.stream.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class GoogleDriveCrawler:
+    """
+    Walks a Drive folder tree with a bounded number of concurrent listings.
+
+    ``crawl`` yields lists of ``(file, folder_name)`` pairs, one list per
+    ``files().list`` page, as soon as each page is received.
+    """
+
+    _fields = "nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime)"
+
+    def __init__(self, workers: int = 8, page_size: int = 1000):
+        self.workers = max(workers, 1)
+        self.page_size = page_size
+        self._local = threading.local()
+
+    def _service(self):
+        # googleapiclient services are not thread-safe, keep one per thread
+        if getattr(self._local, "service", None) is None:
+            self._local.service = build_drive_service()
+        return self._local.service
+
+    def _sync_list_page(self, folder_id: str, page_token: Optional[str]) -> dict:
+        return (
+            self._service()
+            .files()
+            .list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                pageSize=self.page_size,
+                pageToken=page_token,
+                fields=self._fields,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+            .execute()
+        )
+
+    async def _list_folder(
+        self,
+        folder_id: str,
+        folder_name: str,
+        folders: asyncio.Queue,
+        results: asyncio.Queue,
+    ):
+        loop = asyncio.get_running_loop()
+        page_token = None
+        while True:
+            res = await loop.run_in_executor(
+                None, self._sync_list_page, folder_id, page_token
+            )
+            files = list()
+            for item in res.get("files", []):
+                item_path = f"{folder_name}/{item['name']}"
+                if item["mimeType"] == FOLDER_MIME_TYPE:
+                    folders.put_nowait((item["id"], item_path))
+                else:
+                    files.append((item, folder_name))
+            if files:
+                await results.put(files)
+            page_token = res.get("nextPageToken")
+            if not page_token:
+                break
+
+    async def _worker(self, folders: asyncio.Queue, results: asyncio.Queue):
+        while True:
+            folder_id, folder_name = await folders.get()
+            try:
+                await self._list_folder(folder_id, folder_name, folders, results)
+            except Exception as e:
+                await results.put(e)
+            finally:
+                folders.task_done()
+
+    async def crawl(
+        self, folder_id: str, folder_name: str = ""
+    ) -> AsyncIterator[List[Tuple[dict, str]]]:
+        folders: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        folders.put_nowait((folder_id, folder_name))
+        workers = [
+            asyncio.create_task(self._worker(folders, results))
+            for _ in range(self.workers)
+        ]
+
+        async def _finish():
+            await folders.join()
+            await results.put(None)
+
+        finisher = asyncio.create_task(_finish())
+        try:
+            while True:
+                files = await results.get()
+                if files is None:
+                    break
+                if isinstance(files, Exception):
+                    raise files
+                yield files
+        finally:
+            for worker in workers:
+                worker.cancel()
+            finisher.cancel()
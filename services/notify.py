@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+import aiohttp
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+class TaskNotifier:
+    """
+    Producer side of the wake-up channel: tells task runners that new tasks
+    of a type were created. Delivery is best effort, runners still poll.
+    """
+
+    def __init__(self, urls: List[str], timeout: float):
+        self.urls = urls
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def _post(self, url: str, task_type: str):
+        try:
+            async with self.session.post(url, json={"task_type": task_type}):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to notify {url} about {task_type} tasks: {e}")
+
+    async def notify(self, task_type: str):
+        if self.urls:
+            await asyncio.gather(*(self._post(url, task_type) for url in self.urls))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+task_notifier = TaskNotifier(settings.task_notify_urls, settings.task_notify_timeout)
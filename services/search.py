@@ -1,28 +1,162 @@
-from typing import List
+import asyncio
+from typing import Dict, List, Optional, Union
 from lib.typesense.client import AsyncClient
-from api.v1.models.search import BookPageResponse
+from services.cache import (
+    GENERATIONS_COLLECTION,
+    SearchCache,
+    get_project_generation,
+    search_cache,
+)
 
 
 class TextSearch:
-    def __init__(self, client: AsyncClient, project_name: str):
+    _filter_fields = ("book_name", "file_path")
+    _service_collections = ("tasks", GENERATIONS_COLLECTION)
+    _multi_search_limit = 50
+
+    def __init__(
+        self,
+        client: AsyncClient,
+        project_name: str,
+        cache: Optional[SearchCache] = None,
+    ):
         self.client = client
         self.project_name = project_name
+        self.cache = cache or search_cache
+
+    async def _project_generation(self, project_name: str) -> int:
+        generation = self.cache.get_generation(project_name)
+        if generation is None:
+            generation = await get_project_generation(self.client, project_name)
+            self.cache.set_generation(project_name, generation)
+        return generation
 
-    async def search(self, query: str) -> List[BookPageResponse]:
+    def _build_filter(self, filters: Optional[Dict[str, str]]) -> str:
+        if not filters:
+            return ""
+        return " && ".join(
+            f"{name}:=`{value.replace('`', '')}`"
+            for name, value in filters.items()
+            if name in self._filter_fields and value
+        )
+
+    def build_query_params(
+        self,
+        query: str,
+        page: int = 1,
+        per_page: int = 10,
+        include_content: bool = True,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> dict:
         query_params = {
             "q": query,
             "query_by": "book_name,page_content",
             "sort_by": "page_number:asc",
             "order": "asc",
+            "page": page,
+            "per_page": per_page,
+            "highlight_fields": "page_content",
         }
-        res = await self.client.collections[self.project_name].documents.asearch(
-            query_params
+        if not include_content:
+            query_params["include_fields"] = "file_path,book_name,page_number"
+        filter_by = self._build_filter(filters)
+        if filter_by:
+            query_params["filter_by"] = filter_by
+        return query_params
+
+    @staticmethod
+    def build_response(hit: dict, **extra) -> dict:
+        # already in the BookPageResponse shape, so routes can return it as is
+        document = hit["document"]
+        return dict(
+            file_path=document["file_path"],
+            book_name=document["book_name"],
+            page_number=document["page_number"],
+            page_content=document.get("page_content"),
+            snippets=[highlight["snippet"] for highlight in hit.get("highlights", [])],
+            **extra,
         )
+
+    async def list_projects(self) -> List[str]:
+        collections = await self.client.collections.aretrieve()
         return [
-            BookPageResponse(
-                **hit["document"],
-                snippets=[highlight["snippet"] for highlight in hit["highlights"]],
+            collection["name"]
+            for collection in collections
+            if collection["name"] not in self._service_collections
+        ]
+
+    async def search(
+        self,
+        query: str,
+        project_name: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 10,
+        include_content: bool = True,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> List[dict]:
+        project_name = project_name or self.project_name
+        query_params = self.build_query_params(
+            query, page, per_page, include_content, filters
+        )
+        cache_key = self.cache.make_key(project_name, query, query_params)
+        generation = await self._project_generation(project_name)
+        cached = self.cache.get(cache_key, generation)
+        if cached is not None:
+            return cached
+        res = await self.client.collections[project_name].documents.asearch(
+            query_params
+        )
+        result = [
+            self.build_response(hit) for hit in res["hits"] if hit.get("document")
+        ]
+        self.cache.set(cache_key, generation, result)
+        return result
+
+    async def multi_search(
+        self,
+        query: str,
+        projects: Union[List[str], str] = "all",
+        limit: int = 20,
+        include_content: bool = True,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> List[dict]:
+        if projects == "all":
+            projects = await self.list_projects()
+        if not projects:
+            return list()
+        query_params = self.build_query_params(
+            query, 1, limit, include_content, filters
+        )
+        query_params.pop("sort_by")
+        # Typesense rejects multi searches with more than 50 queries
+        chunks = [
+            projects[i : i + self._multi_search_limit]
+            for i in range(0, len(projects), self._multi_search_limit)
+        ]
+        responses = await asyncio.gather(
+            *(
+                self.client.multi_search.aperform(
+                    {
+                        "searches": [
+                            {**query_params, "collection": project} for project in chunk
+                        ]
+                    }
+                )
+                for chunk in chunks
+            )
+        )
+        results = [result for res in responses for result in res["results"]]
+        hits = list()
+        for project, result in zip(projects, results):
+            if "error" in result:
+                raise ValueError(f"Failed to search {project}: {result['error']}")
+            hits.extend(
+                (hit.get("text_match", 0), project, hit)
+                for hit in result["hits"]
+                if hit.get("document")
             )
-            for hit in res["hits"]
-            if hit.get("document")
+        hits.sort(key=lambda item: item[0], reverse=True)
+        return [
+            self.build_response(hit, project_name=project)
+            for _, project, hit in hits[:limit]
         ]
@@ -1,18 +1,31 @@
 import asyncio
-from typing import IO, List, Optional, Tuple
-import io
+from collections import defaultdict
+from functools import partial
+from typing import IO, AsyncIterator, Dict, List, Optional, Set, Tuple
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 
 from core.settings import settings
 from lib.typesense.client import AsyncClient
-from lib.converter.base import BaseConverter
-from lib.converter.pdf.reader import PdfReader
-from lib.converter.word.reader import WordReader
-from db.typesense.models import UploadTaskModel, UploadTaskType, UploadTaskStatus
-
+from lib.converter.base import BaseConverter, download_buffer
+from lib.converter.registry import converter_registry
+from lib.typesense.bulk import BulkWriter
+from db.typesense.models import (
+    BookPageModel,
+    UploadTaskModel,
+    UploadTaskPriority,
+    UploadTaskType,
+    UploadTaskStatus,
+    page_document_id,
+)
+from services.cache import bump_project_generation
+from services.notify import task_notifier
+from services.google_drive import (
+    FOLDER_MIME_TYPE,
+    GoogleDriveCrawler,
+    HashingWriter,
+    build_drive_service,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -22,8 +35,22 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
+class TaskLeaseLost(Exception):
+    pass
+
+
 class FileUploader:
-    _ext_converter_map = {"pdf": PdfReader, "docx": WordReader, "doc": WordReader}
+    _dedup_per_page = 250
+    _synced_collections: Set[str] = set()
+    # fields owned by the task runner, see BaseTaskRunner._compare_and_set
+    _runner_fields = {
+        "version",
+        "worker_id",
+        "lease_expires_at",
+        "attempts",
+        "not_before",
+        "last_error",
+    }
 
     def __init__(self, client: AsyncClient, project_name: str):
         self.client = client
@@ -31,12 +58,15 @@ class FileUploader:
         self.google_service = None
 
     async def create_converter(
-        self, file_path: str, file_content: IO[bytes], file_ext: str, *args, **kwargs
+        self,
+        file_path: str,
+        file_content: IO[bytes],
+        mime_type: str = "",
+        *args,
+        **kwargs,
     ) -> BaseConverter:
-        logger.info(f"Creating converter for {file_ext} file.")
-        converter_cls = self._ext_converter_map.get(file_ext.lower())
-        if not converter_cls:
-            raise ValueError(f"Unsupported file format {file_ext}")
+        converter_cls = converter_registry.detect(file_content, file_path, mime_type)
+        logger.info(f"Creating {converter_cls.__name__} for {file_path} file.")
         return await converter_cls.create(
             self.client,
             self.project_name,
@@ -46,152 +76,425 @@ class FileUploader:
             **kwargs,
         )
 
-    def _sync_google_load_file(
-        self, file_id: str, file_name: str = ""
-    ) -> Tuple[str, bytes]:
+    def _sync_google_file_info(self, file_id: str) -> dict:
         if not self.google_service:
-            credentials = service_account.Credentials.from_service_account_file(
-                settings.google_service_account_file,
-                scopes=["https://www.googleapis.com/auth/drive.readonly"],
-            )
-            self.google_service = build("drive", "v3", credentials=credentials)
-        if not file_name:
-            file_info = (
-                self.google_service.files()
-                .get(fileId=file_id, fields="id, name, mimeType, modifiedTime, size")
-                .execute()
+            self.google_service = build_drive_service()
+        file_info = (
+            self.google_service.files()
+            .get(
+                fileId=file_id,
+                fields="id, name, mimeType, modifiedTime, md5Checksum, size",
+                supportsAllDrives=True,
             )
-            logger.info(f"Google file info: {file_info}")
-            file_name = file_info["name"]
+            .execute()
+        )
+        logger.info(f"Google file info: {file_info}")
+        return file_info
+
+    def _sync_google_load_file(
+        self, file_id: str, size: Optional[int] = None
+    ) -> Tuple[IO[bytes], str]:
+        if not self.google_service:
+            self.google_service = build_drive_service()
         request = self.google_service.files().get_media(fileId=file_id)
-        buffer = io.BytesIO()
-        downloader = MediaIoBaseDownload(buffer, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            logger.info(f"Download {int(status.progress() * 100)}% complete.")
-
-        file_bytes = buffer.getvalue()
-        logger.info(f"Downloaded {len(file_bytes)} bytes.")
-        return file_name, file_bytes
-
-    async def _google_upload_file_content(self, task: UploadTaskModel):
+        spool = download_buffer(size)
+        writer = HashingWriter(spool)
+        try:
+            downloader = MediaIoBaseDownload(
+                writer, request, chunksize=settings.download_chunk_size
+            )
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+                logger.info(f"Download {int(status.progress() * 100)}% complete.")
+        except Exception:
+            spool.close()
+            raise
+
+        logger.info(f"Downloaded {spool.tell()} bytes.")
+        spool.seek(0)
+        return spool, writer.hexdigest()
+
+    @staticmethod
+    def _same_revision(indexed: UploadTaskModel, task: UploadTaskModel) -> bool:
+        if not indexed.md5_checksum and not indexed.modified_time:
+            # indexed before revisions were recorded, treat it as up to date
+            return True
+        if task.md5_checksum:
+            return indexed.md5_checksum == task.md5_checksum
+        return indexed.modified_time == task.modified_time
+
+    async def _find_indexed_tasks(
+        self, filter_by: str, per_page: int = 10
+    ) -> List[UploadTaskModel]:
+        res = await self.client.collections["tasks"].documents.asearch(
+            {
+                "q": "*",
+                "query_by": "file_path",
+                "filter_by": f"{filter_by} && status:={UploadTaskStatus.success.value}",
+                "per_page": per_page,
+            }
+        )
+        return [UploadTaskModel.model_validate(hit["document"]) for hit in res["hits"]]
+
+    async def _supersede_indexed_tasks(self, task: UploadTaskModel):
+        """
+        Retire the success tasks of a file before its pages are replaced, so
+        the checksum lookups only ever find the revision that is indexed.
+        """
+        await self.client.collections["tasks"].documents.aupdate(
+            {"status": UploadTaskStatus.superseded.value},
+            {
+                "filter_by": f"file_path:=`{task.file_path}` && project_name:=`{self.project_name}` && status:={UploadTaskStatus.success.value}"
+            },
+        )
+
+    async def _sync_pages_schema(self):
+        if self.project_name in self._synced_collections:
+            return
+        await self.client.sync_collection_fields(self.project_name, BookPageModel)
+        self._synced_collections.add(self.project_name)
+
+    @staticmethod
+    def _pages_filter(task: UploadTaskModel) -> str:
+        # pages indexed before they carried the provider id can only be
+        # found by their display path
+        if "checkpoint_page" in task.model_fields_set:
+            return f"source_id:=`{task.file_path}`"
+        return f"file_path:=`{task.file_name}`"
+
+    async def _delete_pages(self, filter_by: str):
+        await self.client.collections[self.project_name].documents.adelete(
+            {"filter_by": filter_by}
+        )
+
+    async def _alias_pages(self, source: UploadTaskModel, task: UploadTaskModel):
+        logger.info(
+            f"Copying pages of {source.project_name}/{source.file_name} to {task.file_name}"
+        )
+        page = 1
+        async with BulkWriter(
+            self.client.collections[self.project_name].documents,
+            batch_size=self._dedup_per_page,
+        ) as writer:
+            while True:
+                res = await self.client.collections[
+                    source.project_name
+                ].documents.asearch(
+                    {
+                        "q": "*",
+                        "query_by": "file_path",
+                        "filter_by": self._pages_filter(source),
+                        "sort_by": "page_number:asc",
+                        "page": page,
+                        "per_page": self._dedup_per_page,
+                    }
+                )
+                for hit in res["hits"]:
+                    document = hit["document"]
+                    document["file_path"] = task.file_name
+                    document["source_id"] = task.file_path
+                    document["id"] = page_document_id(
+                        task.file_path, document["page_number"]
+                    )
+                    await writer.add(document)
+                if not res["hits"] or page * self._dedup_per_page >= res["found"]:
+                    break
+                page += 1
+
+    async def _update_owned_task(
+        self, task_id: str, task: UploadTaskModel, changes: Optional[dict] = None
+    ):
+        """
+        Write task changes only while this worker still holds the lease it
+        claimed the task with, so a worker that lost the task can't
+        overwrite what the new owner does.
+        """
+        if changes is None:
+            changes = task.model_dump(mode="json", exclude=self._runner_fields)
+        res = await self.client.collections["tasks"].documents.aupdate(
+            changes,
+            {
+                "filter_by": f"id:={task_id} && version:={task.version} && worker_id:=`{task.worker_id}`"
+            },
+        )
+        if not res.get("num_updated"):
+            raise TaskLeaseLost(f"Task {task_id} is no longer owned by this worker")
+
+    async def _save_checkpoint(
+        self, task_id: str, task: UploadTaskModel, pages: List[dict]
+    ):
+        task.checkpoint_page = pages[-1]["page_number"]
+        task.checkpoint_batch += 1
+        await self._update_owned_task(
+            task_id,
+            task,
+            {
+                "checkpoint_page": task.checkpoint_page,
+                "checkpoint_batch": task.checkpoint_batch,
+            },
+        )
+        await bump_project_generation(self.client, self.project_name)
+
+    async def _google_upload_file_content(self, task_id: str, task: UploadTaskModel):
         loop = asyncio.get_event_loop()
-        file_name, file_bytes = await loop.run_in_executor(
-            None, self._sync_google_load_file, task.file_path, task.file_name
+        file_info = await loop.run_in_executor(
+            None, self._sync_google_file_info, task.file_path
+        )
+        checkpointed = UploadTaskModel.model_construct(
+            md5_checksum=task.md5_checksum, modified_time=task.modified_time
+        )
+        task.file_name = task.file_name or file_info["name"]
+        task.md5_checksum = file_info.get("md5Checksum", "")
+        task.modified_time = file_info.get("modifiedTime", "")
+        task.mime_type = file_info.get("mimeType", "")
+
+        resume = bool(task.checkpoint_page) and self._same_revision(checkpointed, task)
+        if resume:
+            logger.info(
+                f"Resuming {task.file_path} after page {task.checkpoint_page}, batch {task.checkpoint_batch}"
+            )
+        else:
+            task.checkpoint_page = 0
+            task.checkpoint_batch = 0
+
+        previous = await self._find_indexed_tasks(
+            f"file_path:=`{task.file_path}` && project_name:=`{self.project_name}`"
         )
-        file_ext = file_name.split(".")[-1]
-        converter_obj = await self.create_converter(
-            file_name, file_bytes, file_ext, lang=task.lang
+        # pages recognized in another language have to be indexed again
+        unchanged = next(
+            (
+                indexed
+                for indexed in previous
+                if indexed.lang == task.lang and self._same_revision(indexed, task)
+            ),
+            None,
         )
-        await converter_obj.save_to_db()
+        if unchanged:
+            logger.info(f"File {task.file_path} is unchanged, skip uploading")
+            task.content_hash = unchanged.content_hash
+            return
+
+        source = None
+        if task.md5_checksum and not resume:
+            source = next(
+                iter(
+                    await self._find_indexed_tasks(
+                        f"md5_checksum:=`{task.md5_checksum}` && lang:=`{task.lang}`",
+                        1,
+                    )
+                ),
+                None,
+            )
+        file_stream = None
+        converter_obj = None
+        if not source:
+            file_stream, task.content_hash = await loop.run_in_executor(
+                None,
+                self._sync_google_load_file,
+                task.file_path,
+                int(file_info.get("size", 0)),
+            )
+            if not resume:
+                source = next(
+                    iter(
+                        await self._find_indexed_tasks(
+                            f"content_hash:=`{task.content_hash}` && lang:=`{task.lang}`",
+                            1,
+                        )
+                    ),
+                    None,
+                )
+        else:
+            task.content_hash = source.content_hash
+
+        try:
+            if (
+                source
+                and source.project_name == self.project_name
+                and source.file_path == task.file_path
+            ):
+                logger.info(f"File {task.file_path} content is unchanged")
+                return
+            await self._sync_pages_schema()
+            await self._supersede_indexed_tasks(task)
+            if not resume:
+                # a resumed task already replaced the old pages on its first run
+                filters = {f"source_id:=`{task.file_path}`"}
+                filters.update(self._pages_filter(indexed) for indexed in previous)
+                for filter_by in filters:
+                    await self._delete_pages(filter_by)
+            if source:
+                await self._alias_pages(source, task)
+                return
+            converter_obj = await self.create_converter(
+                task.file_name,
+                file_stream,
+                task.mime_type,
+                lang=task.lang,
+                start_page=task.checkpoint_page + 1,
+                source_id=task.file_path,
+            )
+            await converter_obj.save_to_db(
+                on_commit=partial(self._save_checkpoint, task_id, task)
+            )
+        finally:
+            await bump_project_generation(self.client, self.project_name)
+            if converter_obj:
+                converter_obj.close()
+            if file_stream:
+                file_stream.close()
 
     async def upload_file_content(self, task_id: str, task: UploadTaskModel):
         if task.task_type != UploadTaskType.upload:
             logger.info(f"Uploading files accept for task {UploadTaskType.upload} only")
             return
         task.status = UploadTaskStatus.pending
-        await (
-            self.client.collections["tasks"]
-            .documents[task_id]
-            .aupdate(task.model_dump(mode="json"))
-        )
+        await self._update_owned_task(task_id, task)
         logger.info(f"Start file {task.file_path}-{task.file_name} uploading...")
         method = getattr(self, f"_{task.provider}_upload_file_content", None)
         if not method:
             logger.info(f"Failed file {task.file_path}-{task.file_name} uploading")
             task.status = UploadTaskStatus.failed
         else:
-            await method(task)
+            await method(task_id, task)
             logger.info(f"Complete file {task.file_path}-{task.file_name} uploading")
             task.status = UploadTaskStatus.success
-        await (
-            self.client.collections["tasks"]
-            .documents[task_id]
-            .aupdate(task.model_dump(mode="json"))
-        )
+        await self._update_owned_task(task_id, task)
         logger.info(f"Update task {task_id} status to {task.status}")
 
-    def _check_upload_task_exists(self, file_path: str, project_name: str) -> bool:
-        query_params = {
+    def _existing_upload_tasks_query(
+        self, file_paths: List[str], project_name: str, page: int = 1
+    ) -> dict:
+        file_paths_filter = ",".join(f"`{file_path}`" for file_path in file_paths)
+        return {
+            "collection": "tasks",
             "q": "*",
             "query_by": "file_path",
-            "filter_by": f"file_path:{file_path} && status:[{UploadTaskStatus.waiting.value},{UploadTaskStatus.pending.value},{UploadTaskStatus.success.value}]",
-            "limit": 1,
+            "filter_by": f"file_path:=[{file_paths_filter}] && project_name:=`{project_name}` && status:[{UploadTaskStatus.waiting.value},{UploadTaskStatus.pending.value},{UploadTaskStatus.success.value}]",
+            "include_fields": "file_path,status,md5_checksum,modified_time",
+            "page": page,
+            "per_page": self._dedup_per_page,
         }
-        res = self.client.collections[project_name].documents.search(query_params)
-        return len(res["hits"]) > 0
 
-    def _sync_google_list_folder(
-        self, folder_id: str, task: UploadTaskModel, folder_name: str = ""
-    ) -> List[UploadTaskModel]:
-        if not self.google_service:
-            credentials = service_account.Credentials.from_service_account_file(
-                settings.google_service_account_file,
-                scopes=["https://www.googleapis.com/auth/drive.readonly"],
-            )
-            self.google_service = build("drive", "v3", credentials=credentials)
-        tasks = list()
-        results = (
-            self.google_service.files()
-            .list(
-                q=f"'{folder_id}' in parents and trashed=false",
-                pageSize=1000,
-                fields="files(id, name, mimeType)",
-            )
-            .execute()
+    async def _get_existing_upload_tasks(
+        self, file_paths: List[str], project_name: str
+    ) -> Dict[str, List[dict]]:
+        chunks = [
+            file_paths[i : i + self._dedup_per_page]
+            for i in range(0, len(file_paths), self._dedup_per_page)
+        ]
+        if not chunks:
+            return dict()
+        res = await self.client.multi_search.aperform(
+            {
+                "searches": [
+                    self._existing_upload_tasks_query(chunk, project_name)
+                    for chunk in chunks
+                ]
+            }
         )
-        for item in results.get("files", []):
-            if item["mimeType"].split(".")[
-                -1
-            ] != "folder" and not self._check_upload_task_exists(
-                item["id"], task.project_name
-            ):
-                tasks.append(
-                    UploadTaskModel(
-                        lang=task.lang,
-                        file_path=item["id"],
-                        project_name=task.project_name,
-                        file_name=f"{folder_name}/{item['name']}",
-                        task_type=UploadTaskType.upload,
-                        provider=task.provider,
-                    )
+        existing = defaultdict(list)
+        for chunk, result in zip(chunks, res["results"]):
+            if "error" in result:
+                raise ValueError(f"Failed to check existing tasks: {result['error']}")
+            for hit in result["hits"]:
+                existing[hit["document"]["file_path"]].append(hit["document"])
+            pages = -(-result["found"] // self._dedup_per_page)
+            for page in range(2, pages + 1):
+                query_params = self._existing_upload_tasks_query(
+                    chunk, project_name, page
                 )
-            else:
-                tasks.extend(
-                    self._sync_google_list_folder(
-                        item["id"], task, f"{folder_name}/{item['name']}"
-                    )
+                query_params.pop("collection")
+                page_res = await self.client.collections["tasks"].documents.asearch(
+                    query_params
                 )
-        return tasks
+                for hit in page_res["hits"]:
+                    existing[hit["document"]["file_path"]].append(hit["document"])
+        return existing
 
-    async def _google_create_upload_files_tasks(self, task: UploadTaskModel):
+    def _is_task_up_to_date(self, task: UploadTaskModel, existing: List[dict]) -> bool:
+        for document in existing:
+            if document["status"] != UploadTaskStatus.success.value:
+                return True
+            indexed = UploadTaskModel.model_construct(
+                md5_checksum=document.get("md5_checksum", ""),
+                modified_time=document.get("modified_time", ""),
+            )
+            if self._same_revision(indexed, task):
+                return True
+        return False
+
+    async def _notify_upload_tasks(self, tasks: List[dict]):
+        await task_notifier.notify(UploadTaskType.upload.value)
+
+    async def _google_iter_files(
+        self, task: UploadTaskModel
+    ) -> AsyncIterator[Tuple[List[Tuple[dict, str]], int]]:
+        """
+        Yield batches of files to upload with the priority for their tasks.
+        Files found by a crawl are bulk work, a single submitted file keeps
+        the priority it was submitted with.
+        """
         loop = asyncio.get_event_loop()
-        tasks = await loop.run_in_executor(
-            None, self._sync_google_list_folder, task.file_path, task
-        )
-        await self.client.collections["tasks"].documents.aimport_(
-            [task.model_dump(mode="json") for task in tasks], {"action": "create"}
+        root = await loop.run_in_executor(
+            None, self._sync_google_file_info, task.file_path
         )
+        if root["mimeType"] != FOLDER_MIME_TYPE:
+            yield [(root, "")], task.priority
+            return
+        crawler = GoogleDriveCrawler(workers=settings.google_crawler_workers)
+        async for files in crawler.crawl(task.file_path):
+            yield files, UploadTaskPriority.bulk.value
+
+    async def _google_create_upload_files_tasks(self, task: UploadTaskModel):
+        async with BulkWriter(
+            self.client.collections["tasks"].documents,
+            on_commit=self._notify_upload_tasks,
+        ) as writer:
+            async for files, priority in self._google_iter_files(task):
+                existing = await self._get_existing_upload_tasks(
+                    [item["id"] for item, _ in files], task.project_name
+                )
+                tasks = [
+                    upload_task
+                    for upload_task in (
+                        UploadTaskModel(
+                            lang=task.lang,
+                            file_path=item["id"],
+                            project_name=task.project_name,
+                            file_name=f"{folder_name}/{item['name']}",
+                            task_type=UploadTaskType.upload,
+                            provider=task.provider,
+                            priority=priority,
+                            md5_checksum=item.get("md5Checksum", ""),
+                            modified_time=item.get("modifiedTime", ""),
+                            mime_type=item["mimeType"],
+                            cost=converter_registry.get_cost(
+                                item["name"], item["mimeType"]
+                            ),
+                        )
+                        for item, folder_name in files
+                    )
+                    if not self._is_task_up_to_date(
+                        upload_task, existing.get(upload_task.file_path, [])
+                    )
+                ]
+                if not tasks:
+                    continue
+                logger.info(f"Creating {len(tasks)} upload tasks for {task.file_path}")
+                await writer.extend(task.model_dump(mode="json") for task in tasks)
 
     async def create_upload_files_tasks(self, task_id: str, task: UploadTaskModel):
         task.status = UploadTaskStatus.pending
-        await (
-            self.client.collections["tasks"]
-            .documents[task_id]
-            .aupdate(task.model_dump(mode="json"))
-        )
+        await self._update_owned_task(task_id, task)
         method = getattr(self, f"_{task.provider}_create_upload_files_tasks", None)
         if not method:
             task.status = UploadTaskStatus.failed
         else:
             await method(task)
             task.status = UploadTaskStatus.success
-        await (
-            self.client.collections["tasks"]
-            .documents[task_id]
-            .aupdate(task.model_dump(mode="json"))
-        )
+        await self._update_owned_task(task_id, task)
 
     async def get_tasks(
         self,
@@ -212,7 +515,9 @@ class FileUploader:
         res = await self.client.collections["tasks"].documents.asearch(query_params)
         return [UploadTaskModel.model_validate(hit["document"]) for hit in res["hits"]]
 
-    def _google_build_task_model(self, file_path: str, lang: str) -> UploadTaskModel:
+    def _google_build_task_model(
+        self, file_path: str, lang: str, priority: int
+    ) -> UploadTaskModel:
         if "http" in file_path:
             file_path = file_path.split("/")[-1]
         return UploadTaskModel(
@@ -221,15 +526,48 @@ class FileUploader:
             project_name=self.project_name,
             provider="google",
             task_type=UploadTaskType.investigate,
+            priority=priority,
         )
 
     async def create_investigate_task(
-        self, file_path: str, lang: str, provider: str
+        self,
+        file_path: str,
+        lang: str,
+        provider: str,
+        priority: int = UploadTaskPriority.bulk.value,
     ) -> UploadTaskModel:
         method = getattr(self, f"_{provider}_build_task_model", None)
         if not method:
             raise ValueError(f"Unsupported provider: {provider}")
-        task = method(file_path, lang)
+        task = method(file_path, lang, priority)
         await self.client.collections["tasks"].documents.acreate(
             task.model_dump(mode="json")
         )
+        await task_notifier.notify(task.task_type)
+
+    async def requeue_tasks(
+        self,
+        statuses: List[UploadTaskStatus],
+        task_type: Optional[UploadTaskType] = None,
+    ) -> int:
+        filter_by = f"status:[{','.join(status.value for status in statuses)}]"
+        if self.project_name:
+            filter_by += f" && project_name:=`{self.project_name}`"
+        if task_type:
+            filter_by += f" && task_type:={task_type.value}"
+        res = await self.client.collections["tasks"].documents.aupdate(
+            {
+                "status": UploadTaskStatus.waiting.value,
+                "attempts": 0,
+                "not_before": 0,
+                "last_error": "",
+                "worker_id": "",
+                "lease_expires_at": 0,
+            },
+            {"filter_by": filter_by},
+        )
+        requeued = res.get("num_updated", 0)
+        logger.info(f"Requeued {requeued} tasks matching {filter_by}")
+        for notified_type in [task_type] if task_type else list(UploadTaskType):
+            await task_notifier.notify(notified_type.value)
+        return requeued
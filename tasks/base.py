@@ -1,12 +1,21 @@
 import asyncio
 import logging
+import os
+import socket
+import time
+import uuid
+from collections import Counter, defaultdict
+from itertools import chain, zip_longest
+from typing import Dict, List, Optional
 
-from typesense.exceptions import ObjectAlreadyExists
+from typesense.exceptions import ObjectAlreadyExists, TypesenseClientError
 
+from core.settings import settings
 from lib.typesense.client import AsyncClient
 from db.typesense.models import UploadTaskModel, UploadTaskType, UploadTaskStatus
 from services.upload import FileUploader
-
+from tasks.errors import is_transient_error, retry_delay
+from tasks.notify import TaskWakeup
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -18,49 +27,282 @@ logger.addHandler(handler)
 
 class BaseTaskRunner:
     _task_type: str = ""
+    _service_class = FileUploader
     _service_method_task_type_map = {
         UploadTaskType.upload: "upload_file_content",
         UploadTaskType.investigate: "create_upload_files_tasks",
     }
 
-    def __init__(self, client: AsyncClient):
+    def __init__(self, client: AsyncClient, concurrency: int = 1, lane: str = ""):
         self.client = client
-        self.service = FileUploader(self.client, "")
+        self.concurrency = max(concurrency, 1)
+        self.lane = lane
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = settings.task_lease_seconds
+        self.heartbeat_seconds = settings.task_heartbeat_seconds
+        self.wakeup = TaskWakeup(
+            self._task_type, settings.task_notify_host, settings.task_notify_port
+        )
+        self.project_concurrency = settings.task_project_concurrency
+        self._in_flight: Dict[str, asyncio.Task] = dict()
+        self._in_flight_projects: Counter = Counter()
+        self._group_page = 1
+        # project of the last claimed task, the next claim starts after it
+        self._last_project: Optional[str] = None
 
-    async def reset_pending_tasks(self):
-        logger.info(
-            f"{self.__class__.__name__}, Looking for tasks with status {UploadTaskStatus.pending.value} and type {self._task_type}"
+    async def _compare_and_set(
+        self, task: dict, status: str, changes: dict, bump: bool = True
+    ) -> bool:
+        """
+        Apply ``changes`` only if the task still has ``status`` and the
+        version it was read with. Every ownership change bumps the version,
+        so a stale worker can't overwrite a task that was handed to another.
+        """
+        version = task.get("version", 0)
+        if bump:
+            changes = {**changes, "version": version + 1}
+        res = await self.client.collections["tasks"].documents.aupdate(
+            changes,
+            {
+                "filter_by": f"id:={task['id']} && version:={version} && status:={status}"
+            },
         )
-        res = await self.client.collections["tasks"].documents.asearch(
+        if not res.get("num_updated"):
+            return False
+        task.update(changes)
+        return True
+
+    async def claim_task(self, task: dict) -> bool:
+        return await self._compare_and_set(
+            task,
+            UploadTaskStatus.waiting.value,
             {
-                "q": "*",
-                "query_by": "project_name",
-                "limit": 10,
-                "filter_by": f"status:={UploadTaskStatus.pending.value} && task_type:={self._task_type}",
-            }
+                "status": UploadTaskStatus.pending.value,
+                "worker_id": self.worker_id,
+                "lease_expires_at": int(time.time()) + self.lease_seconds,
+            },
+        )
+
+    async def renew_lease(self, task: dict) -> bool:
+        return await self._compare_and_set(
+            task,
+            UploadTaskStatus.pending.value,
+            {"lease_expires_at": int(time.time()) + self.lease_seconds},
+            bump=False,
+        )
+
+    async def _heartbeat(self, task: dict, worker: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                renewed = await self.renew_lease(task)
+            except Exception as e:
+                # keep working while the current lease is valid, the next
+                # tick tries again
+                logger.warning(
+                    f"{self.__class__.__name__}, Failed to renew lease on task {task['id']}: {e}"
+                )
+                if time.time() < task["lease_expires_at"]:
+                    continue
+                renewed = False
+            if not renewed:
+                logger.warning(
+                    f"{self.__class__.__name__}, Lost lease on task {task['id']}, stopping it"
+                )
+                worker.cancel()
+                return
+
+    async def reclaim_expired_tasks(self, per_page: int = 250):
+        logger.info(
+            f"{self.__class__.__name__}, Looking for expired tasks with status {UploadTaskStatus.pending.value} and type {self._task_type}"
         )
-        for hit in res["hits"]:
-            _obj = hit["document"]
-            _obj["status"] = UploadTaskStatus.waiting.value
-            await self.client.collections["tasks"].documents[_obj["id"]].aupdate(_obj)
+        now = int(time.time())
+        expired = list()
+        page = 1
+        while True:
+            res = await self.client.collections["tasks"].documents.asearch(
+                {
+                    "q": "*",
+                    "query_by": "project_name",
+                    "filter_by": f"status:={UploadTaskStatus.pending.value} && task_type:={self._task_type}",
+                    "page": page,
+                    "per_page": per_page,
+                }
+            )
+            expired.extend(
+                hit["document"]
+                for hit in res["hits"]
+                if hit["document"].get("lease_expires_at", 0) < now
+                and hit["document"]["id"] not in self._in_flight
+            )
+            if not res["hits"] or page * per_page >= res["found"]:
+                break
+            page += 1
+        for task in expired:
+            # a task that keeps killing its worker must not be retried forever
+            attempts = task.get("attempts", 0) + 1
+            status = (
+                UploadTaskStatus.dead
+                if attempts >= settings.task_max_attempts
+                else UploadTaskStatus.waiting
+            )
+            reclaimed = await self._compare_and_set(
+                task,
+                UploadTaskStatus.pending.value,
+                {
+                    "status": status.value,
+                    "worker_id": "",
+                    "lease_expires_at": 0,
+                    "attempts": attempts,
+                    "not_before": 0,
+                    "last_error": "Lease expired",
+                },
+            )
+            if reclaimed:
+                logger.info(
+                    f"{self.__class__.__name__}, Reclaimed task {task['id']} with expired lease as {status.value}"
+                )
+
+    async def backfill_retry_fields(self, per_page: int = 250):
+        """
+        Tasks created before leases and retries existed have no ``version``
+        to compare and set, and waiting ones no ``not_before`` to match the
+        waiting tasks filter.
+        """
+        documents = self.client.collections["tasks"].documents
+        backfills = {
+            "version": {"version": 0},
+            "not_before": {"attempts": 0, "not_before": 0},
+        }
+        missing = defaultdict(list)
+        page = 1
+        while True:
+            res = await documents.asearch(
+                {
+                    "q": "*",
+                    "query_by": "project_name",
+                    "filter_by": f"status:[{UploadTaskStatus.waiting.value},{UploadTaskStatus.pending.value}] && task_type:={self._task_type}",
+                    "include_fields": "id,version,not_before",
+                    "page": page,
+                    "per_page": per_page,
+                }
+            )
+            for hit in res["hits"]:
+                for field in backfills:
+                    if field not in hit["document"]:
+                        missing[field].append(hit["document"]["id"])
+            if not res["hits"] or page * per_page >= res["found"]:
+                break
+            page += 1
+        for field, ids in missing.items():
+            for start in range(0, len(ids), per_page):
+                await documents.aupdate(
+                    backfills[field],
+                    {"filter_by": f"id:[{','.join(ids[start : start + per_page])}]"},
+                )
 
-    async def get_waiting_tasks(self):
+    async def get_waiting_tasks(self) -> List[dict]:
+        """
+        Fetch the best waiting tasks of every project and interleave them
+        round-robin, starting with the project after the last one served,
+        so one large project can't starve the others. Higher priority tasks
+        still go first.
+
+        The first page of project groups holds the highest priority work and
+        is always fetched. The groups past it are served one page at a time,
+        in rotation, so every project eventually gets a turn.
+        """
         logger.info(
             f"{self.__class__.__name__}, Looking for tasks with status {UploadTaskStatus.waiting.value} and type {self._task_type}"
         )
-        res = await self.client.collections["tasks"].documents.asearch(
+        filter_by = f"status:={UploadTaskStatus.waiting.value} && task_type:={self._task_type} && not_before:<={int(time.time())}"
+        if self.lane:
+            filter_by += f" && cost:={self.lane}"
+        per_page = max(10, self.concurrency * 2)
+        pages = [1] if self._group_page == 1 else [1, self._group_page]
+        res = await self.client.multi_search.aperform(
             {
-                "q": "*",
-                "query_by": "project_name",
-                "limit": 10,
-                "filter_by": f"status:={UploadTaskStatus.waiting.value} && task_type:={self._task_type}",
-            }
+                "searches": [
+                    {
+                        "q": "*",
+                        "query_by": "project_name",
+                        "filter_by": filter_by,
+                        "sort_by": "priority:desc",
+                        "group_by": "project_name",
+                        # the largest group_limit Typesense accepts
+                        "group_limit": min(self.concurrency, 99),
+                        "page": page,
+                        "per_page": per_page,
+                    }
+                    for page in pages
+                ]
+            },
+            {"collection": "tasks"},
+        )
+        for result in res["results"]:
+            if "error" in result:
+                raise TypesenseClientError(
+                    f"Failed to fetch waiting tasks: {result['error']}"
+                )
+        # "found" counts groups when grouping
+        if self._group_page * per_page < res["results"][-1]["found"]:
+            self._group_page += 1
+        else:
+            self._group_page = 1
+        groups = dict()
+        for result in res["results"]:
+            for group in result["grouped_hits"]:
+                groups.setdefault(
+                    group["group_key"][0], [hit["document"] for hit in group["hits"]]
+                )
+        projects = sorted(groups)
+        if self._last_project is not None:
+            projects = [
+                project for project in projects if project > self._last_project
+            ] + [project for project in projects if project <= self._last_project]
+        rounds = zip_longest(*(groups[project] for project in projects))
+        tasks = [task for task in chain.from_iterable(rounds) if task is not None]
+        # stable, so tasks of equal priority keep the round-robin order
+        return sorted(tasks, key=lambda task: -task.get("priority", 0))
+
+    def _project_is_full(self, task: dict) -> bool:
+        return (
+            self.project_concurrency > 0
+            and self._in_flight_projects[task["project_name"]]
+            >= self.project_concurrency
         )
-        return [hit["document"] for hit in res["hits"]]
 
-    async def _mark_task_failed(self, task: dict):
-        task["status"] = UploadTaskStatus.failed
-        await self.client.collections["tasks"].documents[task["id"]].aupdate(task)
+    async def _mark_task_failed(self, task: dict, error: Optional[Exception] = None):
+        """
+        Schedule another attempt with exponential backoff for transient
+        errors, fail permanently otherwise. Tasks that run out of attempts
+        are moved to the dead status.
+        """
+        attempts = task.get("attempts", 0) + 1
+        changes = {"attempts": attempts, "last_error": str(error or "")[:1000]}
+        transient = error is not None and is_transient_error(error)
+        if transient and attempts < settings.task_max_attempts:
+            delay = retry_delay(attempts)
+            changes.update(
+                status=UploadTaskStatus.waiting.value,
+                not_before=int(time.time()) + delay,
+                worker_id="",
+                lease_expires_at=0,
+            )
+            logger.warning(
+                f"{self.__class__.__name__}, Retrying task {task['id']} in {delay}s, attempt {attempts}"
+            )
+        elif transient:
+            changes["status"] = UploadTaskStatus.dead.value
+        else:
+            changes["status"] = UploadTaskStatus.failed.value
+        updated = await self._compare_and_set(
+            task, UploadTaskStatus.pending.value, changes
+        )
+        if not updated:
+            logger.warning(
+                f"{self.__class__.__name__}, Task {task['id']} is no longer owned by {self.worker_id}"
+            )
 
     async def process_task(self, task: dict):
         try:
@@ -69,20 +311,19 @@ class BaseTaskRunner:
             logger.error(
                 f"{self.__class__.__name__}, Failed model validation for task {task['id']}: {e}"
             )
-            await self._mark_task_failed(task)
+            await self._mark_task_failed(task, e)
             return
         else:
-            self.service.project_name = task_obj.project_name
+            service = self._service_class(self.client, task_obj.project_name)
             method = getattr(
-                self.service,
+                service,
                 self._service_method_task_type_map.get(task_obj.task_type),
                 None,
             )
             if not method:
-                logger.error(
-                    f"{self.__class__.__name__}, Method for {task_obj.task_type} was not found"
-                )
-                await self._mark_task_failed(task)
+                error = ValueError(f"Method for {task_obj.task_type} was not found")
+                logger.error(f"{self.__class__.__name__}, {error}")
+                await self._mark_task_failed(task, error)
                 return
             try:
                 await method(task["id"], task_obj)
@@ -90,19 +331,82 @@ class BaseTaskRunner:
                 logger.error(
                     f"{self.__class__.__name__}, Failed process task {task['id']}: {e}"
                 )
-                await self._mark_task_failed(task)
+                await self._mark_task_failed(task, e)
                 return
 
+    async def _process_task_slot(self, task: dict):
+        heartbeat = asyncio.create_task(self._heartbeat(task, asyncio.current_task()))
+        try:
+            await self.process_task(task)
+        finally:
+            heartbeat.cancel()
+            self._in_flight.pop(task["id"], None)
+            self._in_flight_projects[task["project_name"]] -= 1
+
     async def run(self):
         try:
             await self.client.create_collection("tasks", UploadTaskModel)
         except ObjectAlreadyExists:
-            pass
-        await self.reset_pending_tasks()
+            await self.client.sync_collection_fields("tasks", UploadTaskModel)
+        await self.backfill_retry_fields()
+        await self.wakeup.start()
+        try:
+            await self._run_loop()
+        finally:
+            await self.wakeup.stop()
+
+    async def _claim_waiting_tasks(self) -> int:
+        """
+        Claim at most as many tasks as there are free slots, the rest are
+        left for the next query, which may bring more urgent work.
+        """
+        claimed = 0
+        for task in await self.get_waiting_tasks():
+            if len(self._in_flight) >= self.concurrency:
+                break
+            if task["id"] in self._in_flight or self._project_is_full(task):
+                continue
+            if not await self.claim_task(task):
+                continue
+            claimed += 1
+            self._last_project = task["project_name"]
+            self._in_flight_projects[task["project_name"]] += 1
+            self._in_flight[task["id"]] = asyncio.create_task(
+                self._process_task_slot(task)
+            )
+        return claimed
+
+    async def _run_loop(self):
+        reclaimed_at = None
+        poll_seconds = settings.task_poll_min_seconds
         while True:
-            tasks = await self.get_waiting_tasks()
-            for task in tasks:
-                await self.process_task(task)
-            if not tasks:
-                logger.info(f"{self.__class__.__name__}, No tasks found")
-                await asyncio.sleep(60)
+            if (
+                reclaimed_at is None
+                or time.monotonic() - reclaimed_at >= self.lease_seconds
+            ):
+                await self.reclaim_expired_tasks()
+                reclaimed_at = time.monotonic()
+            # notifications that arrive while we are querying must not be lost
+            self.wakeup.clear()
+            claimed = 0
+            if len(self._in_flight) < self.concurrency:
+                claimed = await self._claim_waiting_tasks()
+            if claimed:
+                poll_seconds = settings.task_poll_min_seconds
+                if len(self._in_flight) < self.concurrency:
+                    continue
+            elif not self._in_flight:
+                logger.info(
+                    f"{self.__class__.__name__}, No tasks found, waiting up to {poll_seconds}s"
+                )
+            woken = self.wakeup.wait()
+            done, _ = await asyncio.wait(
+                [woken, *self._in_flight.values()],
+                timeout=poll_seconds,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            woken.cancel()
+            if not done:
+                poll_seconds = min(poll_seconds * 2, settings.task_poll_max_seconds)
+            elif woken in done:
+                poll_seconds = settings.task_poll_min_seconds
@@ -0,0 +1,51 @@
+import asyncio
+import random
+
+import aiohttp
+from googleapiclient.errors import HttpError
+from typesense.exceptions import HTTPStatus0Error, ServerError, ServiceUnavailable
+
+from core.settings import settings
+from lib.typesense.bulk import BulkImportError
+
+_TRANSIENT_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Errors worth retrying later: network failures, timeouts, Typesense
+    overload and Google Drive 5xx or rate limit responses. Everything else
+    (bad files, missing permissions, validation) fails the same way again.
+    """
+    if isinstance(
+        error,
+        (
+            asyncio.TimeoutError,
+            TimeoutError,
+            ConnectionError,
+            aiohttp.ClientConnectionError,
+            HTTPStatus0Error,
+            ServerError,
+            ServiceUnavailable,
+        ),
+    ):
+        return True
+    if isinstance(error, BulkImportError):
+        return error.transient
+    if isinstance(error, HttpError):
+        if error.resp.status in _TRANSIENT_HTTP_STATUSES:
+            return True
+        return error.resp.status == 403 and any(
+            reason in str(error) for reason in _RATE_LIMIT_REASONS
+        )
+    return False
+
+
+def retry_delay(attempts: int) -> int:
+    delay = min(
+        settings.task_retry_base_seconds * 2 ** max(attempts - 1, 0),
+        settings.task_retry_max_seconds,
+    )
+    # spread retries of tasks that failed together, e.g. on a rate limit
+    return int(delay * random.uniform(0.8, 1.2))
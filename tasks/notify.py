@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+
+class TaskWakeup:
+    """
+    Runner side of the wake-up channel: a small HTTP listener that sets an
+    event when a notification for ``task_type`` arrives.
+    """
+
+    def __init__(self, task_type: str, host: str, port: int):
+        self.task_type = task_type
+        self.host = host
+        self.port = port
+        self._event = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_notify(self, request: web.Request) -> web.Response:
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.json_response({"message": "Invalid body"}, status=400)
+        if data.get("task_type") == self.task_type:
+            self._event.set()
+        return web.json_response(dict())
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_post("/notify", self._handle_notify)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Listening for {self.task_type} notifications on {self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+        self._runner = None
+
+    def wait(self) -> "asyncio.Task[bool]":
+        return asyncio.ensure_future(self._event.wait())
+
+    def clear(self):
+        self._event.clear()